@@ -0,0 +1,443 @@
+# app/batch.py
+#
+# Headless batch rendering. Reads invoice records from a CSV or JSONL file and
+# renders them with generate_invoice_pdf across a pool of worker processes,
+# either as loose PDFs or streamed into a ZIP/tar bundle.
+
+import argparse
+import csv
+import json
+import os
+import posixpath
+import re
+import sys
+import time
+from contextlib import nullcontext
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from app.ui.pdf_generator import generate_invoice_pdf, generate_invoices_pdf, render_invoice_bytes
+from app.ui.models import Invoice
+from app.ui.validators import validate_records
+from app.ui.config_store import CONFIG_FIELDS, ConfigStore, default_config_path
+from app.ui.render_stats import RenderStats, summarize, format_summary
+from app.ledger import Ledger, default_ledger_path
+from app.bundle import BundleWriter
+from app.render_cache import DEFAULT_MAX_BYTES, RenderCache, default_cache_dir, render_key
+
+DEFAULT_CONFIG_PATH = default_config_path()
+
+# Records are validated this many at a time before being scheduled
+VALIDATION_BLOCK = 1000
+# Rendered invoices are written to the ledger in transactions of this size
+LEDGER_BATCH = 500
+
+
+def load_letterhead(path=DEFAULT_CONFIG_PATH):
+    if not path:
+        return {}
+    config = ConfigStore(path).load()
+    return {key: config[key] for key in CONFIG_FIELDS if config.get(key)}
+
+
+class UnreadableRecord:
+    # Stands in for an input line that could not be parsed, so the rest of
+    # the batch carries on and the line is reported with the failures
+
+    __slots__ = ("line", "error")
+
+    def __init__(self, line, error):
+        self.line = line
+        self.error = error
+
+    def __str__(self):
+        return f"line {self.line}: {self.error}"
+
+
+def read_records(path):
+    # Yields one data dict per invoice, or an UnreadableRecord for a line that
+    # does not parse; the format is picked from the extension
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield UnreadableRecord(line_number, f"Invalid JSON: {e}")
+    elif ext == ".csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                try:
+                    yield _record_from_csv_row(row)
+                except ValueError as e:
+                    yield UnreadableRecord(reader.line_num, f"Invalid items JSON: {e}")
+    else:
+        raise ValueError(f"Unsupported batch input format: {path}")
+
+
+def _record_from_csv_row(row):
+    record = {key: value for key, value in row.items() if key and value not in (None, "")}
+    # Items come either as a JSON list in an "items" column or as a single
+    # description/qty/amount triple on the row itself
+    if "items" in record:
+        record["items"] = json.loads(record["items"])
+    elif "description" in record:
+        record["items"] = [{
+            "description": record.pop("description"),
+            "qty": record.pop("qty", "1"),
+            "amount": record.pop("amount", ""),
+        }]
+    return record
+
+
+def prepare_record(record, letterhead=None):
+    # Builds a validated Invoice from a record, filling letterhead fields the
+    # record leaves out; raises ValueError for malformed items
+    data = dict(letterhead or {})
+    data.update(record)
+    return Invoice.from_dict(data)
+
+
+def output_name(index, record):
+    # A record's own "output" is reduced to a file name so it cannot point
+    # outside the output directory
+    name = posixpath.basename(str(record.get("output") or "").replace("\\", "/"))
+    if name not in ("", ".", ".."):
+        return name
+    client = re.sub(r"[^A-Za-z0-9]+", "_", str(record.get("client_name") or "")).strip("_") or "invoice"
+    return f"{index + 1:05d}_{client}.pdf"
+
+
+def validated_records(records, failures, block_size=VALIDATION_BLOCK):
+    # Yields (index, record) for records that pass column-wise validation,
+    # checking them a block at a time so bad rows are rejected before any
+    # rendering is scheduled without reading the whole input up front
+    index = 0
+    while True:
+        block = list(islice(records, block_size))
+        if not block:
+            return
+        unreadable = {
+            index + offset: record for offset, record in enumerate(block) if isinstance(record, UnreadableRecord)
+        }
+        # Unreadable lines are validated as empty records to keep the rows
+        # aligned; their own parse error is reported instead
+        report = validate_records(
+            [{} if index + offset in unreadable else record for offset, record in enumerate(block)], start=index
+        )
+        for row, problems in report.errors_by_row().items():
+            if row not in unreadable:
+                failures.append((row, "; ".join(message for _, message in problems)))
+        for row, record in unreadable.items():
+            failures.append((row, str(record)))
+        bad = set(report.bad_rows) | set(unreadable)
+        for offset, record in enumerate(block):
+            if index + offset not in bad:
+                yield index + offset, record
+        index += len(block)
+
+
+def _render_one(index, invoice, filepath, with_stats=False, deterministic=False):
+    # Runs in a worker process; any failure is reported back instead of
+    # taking down the rest of the batch. With filepath None the PDF bytes are
+    # returned in its place.
+    stats = RenderStats() if with_stats else None
+    try:
+        if filepath is None:
+            pdf_bytes = render_invoice_bytes(invoice, stats=stats, deterministic=deterministic)
+            return index, pdf_bytes, None, stats and stats.as_dict()
+        generate_invoice_pdf(invoice, filepath, stats=stats, deterministic=deterministic)
+        return index, filepath, None, stats and stats.as_dict()
+    except Exception as e:
+        return index, None, f"{type(e).__name__}: {e}", None
+
+
+def render_batch(records, out_dir, workers=None, letterhead=None, on_result=None, stats=False, ledger=None,
+                 bundle=None, cache=None, deterministic=False):
+    # With stats=True the result also carries per-section timing percentiles.
+    # Rendered invoices are recorded in ledger, if given. With a BundleWriter
+    # as bundle the PDFs go into the archive instead of out_dir, and
+    # on_result receives member names rather than file paths. With a
+    # RenderCache, invoices rendered before are copied from it instead of
+    # being scheduled, and the result carries its hit/miss counters; cached
+    # renders are always deterministic. deterministic=True makes the PDFs
+    # byte-identical across runs.
+    if bundle is None:
+        os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    # Keep a bounded number of records in flight so large inputs are never
+    # held in memory all at once
+    max_in_flight = workers * 4
+    rendered = 0
+    failures = []
+    samples = []
+    # index -> (Invoice, output name, cache key) while rendering
+    in_flight = {}
+    # Workers hand back the PDF bytes when the parent has to store them
+    in_memory = bundle is not None or cache is not None
+    deterministic = deterministic or cache is not None
+    to_record = []
+    start = time.perf_counter()
+    bundle_path = bundle.target if bundle is not None and isinstance(bundle.target, str) else None
+
+    def flush_ledger():
+        if ledger is not None and to_record:
+            ledger.record_many(to_record)
+        to_record.clear()
+
+    def store(index, invoice, name, data):
+        # Writes rendered bytes into the bundle or out_dir; returns the
+        # (path, error) pair a worker would have reported
+        try:
+            if bundle is not None:
+                return bundle.add(name, data, invoice, index), None
+            filepath = os.path.join(out_dir, name)
+            with open(filepath, "wb") as f:
+                f.write(data)
+            return filepath, None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+
+    def finished(index, invoice, filepath, error):
+        nonlocal rendered
+        if error:
+            failures.append((index, error))
+        else:
+            rendered += 1
+            if ledger is not None:
+                to_record.append((invoice, filepath if bundle is None else bundle_path))
+        if on_result:
+            on_result(index, filepath, error)
+        if len(to_record) >= LEDGER_BATCH:
+            flush_ledger()
+
+    def submit(pool, index):
+        invoice, name, _ = in_flight[index]
+        filepath = None if in_memory else os.path.join(out_dir, name)
+        future = pool.submit(_render_one, index, invoice, filepath, stats, deterministic)
+        submitted[future] = index
+        return future
+
+    def collect(done):
+        # Returns the indexes whose worker died under them; they stay in
+        # in_flight to be rendered again
+        broken = []
+        for future in done:
+            index = submitted.pop(future)
+            try:
+                index, output, error, sample = future.result()
+            except BrokenProcessPool:
+                broken.append(index)
+                continue
+            invoice, name, key = in_flight.pop(index)
+            if sample:
+                samples.append(sample)
+            if error is None and in_memory:
+                if cache is not None:
+                    cache.put(key, output)
+                output, error = store(index, invoice, name, output)
+            finished(index, invoice, output, error)
+        return broken
+
+    def rerun_isolated(indexes):
+        # A worker that dies (killed by the OS, a crash in a C extension)
+        # breaks the whole pool and everything in flight with it. Those
+        # records are rendered again one at a time so only the one that
+        # takes its worker down fails.
+        solo = None
+        try:
+            for index in sorted(indexes):
+                if solo is None:
+                    solo = ProcessPoolExecutor(max_workers=1)
+                if collect([submit(solo, index)]):
+                    invoice, name, _ = in_flight.pop(index)
+                    if not in_memory:
+                        # Whatever it had written of the PDF
+                        try:
+                            os.remove(os.path.join(out_dir, name))
+                        except OSError:
+                            pass
+                    finished(index, invoice, None, "Worker process died while rendering this invoice")
+                    solo.shutdown(wait=False)
+                    solo = None
+        finally:
+            if solo is not None:
+                solo.shutdown()
+
+    def replace_pool(broken=()):
+        # Everything still pending in a broken pool fails with it
+        nonlocal pool, pending
+        done, pending = wait(pending)
+        broken = [*broken, *collect(done)]
+        pool.shutdown(wait=False)
+        pool = ProcessPoolExecutor(max_workers=workers)
+        rerun_isolated(broken)
+
+    def reap():
+        nonlocal pending
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        broken = collect(done)
+        if broken:
+            replace_pool(broken)
+
+    # future -> index of the record it renders
+    submitted = {}
+    pending = set()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for index, record in validated_records(iter(records), failures):
+            try:
+                invoice = prepare_record(record, letterhead)
+                name = output_name(index, record)
+            except Exception as e:
+                failures.append((index, f"{type(e).__name__}: {e}"))
+                continue
+            key = render_key(invoice) if cache is not None else None
+            cached = cache.get(key) if key is not None else None
+            if cached is not None:
+                finished(index, invoice, *store(index, invoice, name, cached))
+                continue
+            in_flight[index] = (invoice, name, key)
+            try:
+                future = submit(pool, index)
+            except BrokenProcessPool:
+                # Broke since the last reap
+                replace_pool()
+                future = submit(pool, index)
+            pending.add(future)
+            if len(pending) >= max_in_flight:
+                reap()
+        while pending:
+            reap()
+    finally:
+        # PDFs already written are recorded even when the run is cut short
+        try:
+            pool.shutdown()
+        finally:
+            flush_ledger()
+
+    elapsed = time.perf_counter() - start
+    failures.sort()
+    result = {
+        "rendered": rendered,
+        "failed": len(failures),
+        "failures": failures,
+        "elapsed": elapsed,
+        "per_second": rendered / elapsed if elapsed > 0 else 0.0,
+    }
+    if stats:
+        result["stats"] = summarize(samples)
+    if cache is not None:
+        result["cache"] = cache.counters()
+    return result
+
+
+def render_combined(records, filename, letterhead=None, stats=False, ledger=None, deterministic=False):
+    # Renders every record into a single PDF for print runs and archival
+    # bundles. Records that cannot be prepared are skipped and reported; a
+    # failure while drawing aborts the document since its pages are shared.
+    failures = []
+    start = time.perf_counter()
+
+    def prepared(add):
+        for index, record in validated_records(iter(records), failures):
+            try:
+                invoice = prepare_record(record, letterhead)
+            except Exception as e:
+                failures.append((index, f"{type(e).__name__}: {e}"))
+                continue
+            if add is not None:
+                add(invoice, filename)
+            yield invoice
+
+    # Sections are summed over the whole document rather than per invoice
+    render_stats = RenderStats() if stats else None
+    # Ledger rows are committed only once the document has been saved
+    with ledger.bulk() if ledger is not None else nullcontext() as add:
+        rendered = generate_invoices_pdf(prepared(add), filename, stats=render_stats, deterministic=deterministic)
+    elapsed = time.perf_counter() - start
+    failures.sort()
+    result = {
+        "rendered": rendered,
+        "failed": len(failures),
+        "failures": failures,
+        "elapsed": elapsed,
+        "per_second": rendered / elapsed if elapsed > 0 else 0.0,
+    }
+    if stats:
+        result["stats"] = summarize([render_stats.as_dict()])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render invoices from a CSV or JSONL file without the GUI.")
+    parser.add_argument("input", help="CSV or JSONL file with one invoice per row/line")
+    parser.add_argument("-o", "--out-dir", default="invoices", help="Directory for the generated PDFs")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="Letterhead config used for fields a record leaves out")
+    parser.add_argument("--combined", metavar="PDF", help="Render all invoices into this single PDF instead of one file each")
+    parser.add_argument("--bundle", metavar="ARCHIVE", help="Write the PDFs into this .zip, .tar or .tar.gz with a manifest instead of --out-dir")
+    parser.add_argument("--stats", action="store_true", help="Report per-section render timings")
+    parser.add_argument("--stats-json", metavar="FILE", help="Also write the timing summary to this JSON file")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="Byte-identical output for identical input (no wall-clock timestamps or random IDs)")
+    parser.add_argument("--cache", nargs="?", const=default_cache_dir(), metavar="DIR",
+                        help="Reuse PDFs rendered before for unchanged invoices (default store: next to the config)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Size cap of the render cache in MB")
+    parser.add_argument("--ledger", default=default_ledger_path(), help="SQLite ledger the rendered invoices are recorded in")
+    parser.add_argument("--no-ledger", action="store_true", help="Do not record rendered invoices in the ledger")
+    args = parser.parse_args(argv)
+    want_stats = args.stats or bool(args.stats_json)
+
+    letterhead = load_letterhead(args.config)
+    records = read_records(args.input)
+    ledger = None if args.no_ledger else Ledger(args.ledger)
+    cache = RenderCache(args.cache, args.cache_max_mb * 1024 * 1024) if args.cache else None
+    try:
+        if args.combined:
+            result = render_combined(
+                records, args.combined, letterhead=letterhead, stats=want_stats, ledger=ledger,
+                deterministic=args.deterministic,
+            )
+        elif args.bundle:
+            with BundleWriter(args.bundle) as bundle:
+                result = render_batch(
+                    records, args.out_dir, workers=args.workers, letterhead=letterhead, stats=want_stats,
+                    ledger=ledger, bundle=bundle, cache=cache, deterministic=args.deterministic,
+                )
+        else:
+            result = render_batch(
+                records, args.out_dir, workers=args.workers, letterhead=letterhead, stats=want_stats, ledger=ledger,
+                cache=cache, deterministic=args.deterministic,
+            )
+    finally:
+        if ledger is not None:
+            ledger.close()
+
+    for index, error in result["failures"]:
+        print(f"record {index + 1}: {error}", file=sys.stderr)
+    print(
+        f"Rendered {result['rendered']} invoice(s), {result['failed']} failed, "
+        f"in {result['elapsed']:.2f}s ({result['per_second']:.1f} invoices/s)"
+    )
+    if "cache" in result:
+        counters = result["cache"]
+        print(
+            f"Render cache: {counters['hits']} hit(s), {counters['misses']} miss(es), "
+            f"{counters['evictions']} evicted, {counters['bytes'] / (1024 * 1024):.1f} MB stored"
+        )
+        if counters["errors"]:
+            print(f"Render cache: {counters['errors']} read/write error(s); rendering was not affected",
+                  file=sys.stderr)
+    if want_stats:
+        print(format_summary(result["stats"]))
+        if args.stats_json:
+            with open(args.stats_json, "w") as f:
+                json.dump(result["stats"], f, indent=2)
+    return 1 if result["failed"] else 0
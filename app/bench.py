@@ -0,0 +1,273 @@
+# app/bench.py
+#
+# Reproducible benchmarks for the PDF generator and the form's running total.
+#
+#   python -m app.bench                          run and print results
+#   python -m app.bench -o results.json          also store them as JSON
+#   python -m app.bench --save-baseline FILE     store results as the baseline
+#   python -m app.bench --baseline FILE          fail on regressions vs FILE
+#   python -m app.bench --check-determinism      fail unless deterministic
+#                                                renders are byte-identical
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.ui.money import RunningTotal, line_centavos, format_php
+from app.ui.pdf_generator import render_invoice_bytes
+
+ITEM_COUNTS = (1, 50, 1000, 10000)
+# How much slower / larger a case may get before it counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+SHORT_BODY = (
+    "Please see the attached invoice for legal services rendered. "
+    "For any questions or clarifications, feel free to contact us.\n\nThank you for your trust."
+)
+SHORT_FOOTER = (
+    "Main Office| Second Floor, Sound Options Building, Mac Arthur Highway, Tarlac City\n"
+    "Satellite Office| Champaca St., San Vicente, Tarlac City"
+)
+
+
+def _long_text(sentence, count):
+    return " ".join(sentence for _ in range(count))
+
+
+LONG_BODY = _long_text("The firm reserves the right to revise fees for work outside the agreed scope.", 40)
+LONG_FOOTER = _long_text("This statement is confidential and intended solely for the addressee.", 40)
+
+
+def make_logo(directory):
+    from PIL import Image
+    path = os.path.join(directory, "bench_logo.png")
+    img = Image.new("RGBA", (1200, 800))
+    pixels = img.load()
+    for x in range(0, 1200, 4):
+        for y in range(0, 800, 4):
+            pixels[x, y] = (x % 256, y % 256, (x + y) % 256, 200)
+    img.save(path)
+    return path
+
+
+def make_invoice(item_count, body=SHORT_BODY, footer=SHORT_FOOTER, logo_path=""):
+    rng = random.Random(item_count)
+    items = [
+        {
+            "description": f"Legal services rendered, entry {i} " + "research " * rng.randint(0, 8),
+            "qty": str(rng.choice(["1", "1.5", "2", "0.25"])),
+            "amount": str(rng.randint(500, 5000)),
+        }
+        for i in range(item_count)
+    ]
+    return {
+        "client_name": "Juan Dela Cruz",
+        "date": "07-10-2025",
+        "service": "Retainer",
+        "status": "pending",
+        "items": items,
+        "header": "Go Baluyot & Adion Law Office\nChampaca St, San Vicente, Tarlac City\n0909",
+        "footer": footer,
+        "body_message": body,
+        "company_contact": "Noel S. Adion\nGCASH: 0927-920-9550",
+        "contact_message": "For urgent concerns, call 0917-123-4567.",
+        "receiver": "Jocelyn Salvador",
+        "position": "Billing Clerk",
+        "attorney": "Atty. Noel S. Adion",
+        "logo_path": logo_path,
+    }
+
+
+def _measure(fn, repeat):
+    # Best wall time over `repeat` runs, plus peak traced memory of one run
+    times = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak, result
+
+
+def bench_pdf(name, data, repeat):
+    wall, peak, pdf_bytes = _measure(lambda: render_invoice_bytes(data), repeat)
+    return {
+        "name": name,
+        "wall_s": wall,
+        "per_second": 1 / wall if wall else 0.0,
+        "peak_bytes": peak,
+        "output_bytes": len(pdf_bytes),
+    }
+
+
+def bench_totals(rows, keystrokes, repeat):
+    # Typing into one row of a long invoice: every keystroke re-parses that
+    # row and updates the running subtotal, as the form does
+    def run():
+        totals = RunningTotal()
+        for i in range(rows):
+            totals.set(i, line_centavos("1", str(100 + i)) or 0)
+        text = ""
+        for k in range(keystrokes):
+            # Retype the amount every few digits, as a user correcting it would
+            text = text + str(k % 10) if len(text) < 8 else str(k % 10)
+            totals.set(rows // 2, line_centavos("2", text) or 0)
+            format_php(totals.total)
+        return totals.total
+
+    wall, peak, _ = _measure(run, repeat)
+    return {
+        "name": f"totals_{rows}_rows",
+        "wall_s": wall,
+        "per_second": keystrokes / wall if wall else 0.0,
+        "peak_bytes": peak,
+        "output_bytes": 0,
+    }
+
+
+def pdf_cases(logo, quick=False, repeat=3):
+    # (name, invoice data, timed runs) for every PDF case
+    counts = [n for n in ITEM_COUNTS if not (quick and n > 1000)]
+    for count in counts:
+        # Large cases are slow enough that one timed run is representative
+        runs = repeat if count <= 1000 else 1
+        yield f"pdf_{count}_items", make_invoice(count), runs
+        yield f"pdf_{count}_items_logo", make_invoice(count, logo_path=logo), runs
+    yield "pdf_50_items_long_body", make_invoice(50, body=LONG_BODY), repeat
+    yield "pdf_50_items_long_footer", make_invoice(50, footer=LONG_FOOTER), repeat
+    yield "pdf_50_items_long_text_logo", make_invoice(50, body=LONG_BODY, footer=LONG_FOOTER, logo_path=logo), repeat
+
+
+def run_suite(quick=False, repeat=3):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        logo = make_logo(tmp)
+        for name, data, runs in pdf_cases(logo, quick, repeat):
+            results.append(bench_pdf(name, data, runs))
+    results.append(bench_totals(300, 2000, repeat))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def case_hashes(logo, quick=False):
+    # sha256 of each case rendered in deterministic mode
+    return {
+        name: hashlib.sha256(render_invoice_bytes(data, deterministic=True)).hexdigest()
+        for name, data, _ in pdf_cases(logo, quick)
+    }
+
+
+def check_determinism(quick=False):
+    # Renders every case twice here and once more in a fresh interpreter with
+    # a different hash seed, using a copy of the logo at another path with
+    # another mtime; returns the cases whose bytes are not identical
+    with tempfile.TemporaryDirectory() as tmp:
+        logo = make_logo(tmp)
+        first = case_hashes(logo, quick)
+        second = case_hashes(logo, quick)
+        moved_logo = os.path.join(tmp, "moved", "logo_copy.png")
+        os.makedirs(os.path.dirname(moved_logo))
+        shutil.copyfile(logo, moved_logo)
+        stat = os.stat(logo)
+        os.utime(moved_logo, (stat.st_atime + 3600, stat.st_mtime + 3600))
+        env = dict(os.environ, PYTHONHASHSEED=str(random.randint(1, 2 ** 31)))
+        command = [sys.executable, "-m", "app.bench", "--case-hashes", moved_logo]
+        if quick:
+            command.append("--quick")
+        child = json.loads(subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout)
+    return [name for name in first if not (first[name] == second[name] == child.get(name))]
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    # Returns a list of human-readable regressions
+    regressions = []
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    for result in current["results"]:
+        before = previous.get(result["name"])
+        if not before:
+            continue
+        for key, label in (("wall_s", "wall time"), ("peak_bytes", "peak memory"), ("output_bytes", "output size")):
+            old, new = before.get(key, 0), result.get(key, 0)
+            if old and new > old * (1 + tolerance):
+                regressions.append(f"{result['name']}: {label} {old:.4g} -> {new:.4g} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_results(suite, out=sys.stdout):
+    print(f"{'case':<32}{'wall ms':>10}{'per sec':>10}{'peak KiB':>10}{'size KiB':>10}", file=out)
+    for r in suite["results"]:
+        print(
+            f"{r['name']:<32}{r['wall_s'] * 1000:>10.1f}{r['per_second']:>10.1f}"
+            f"{r['peak_bytes'] / 1024:>10.0f}{r['output_bytes'] / 1024:>10.1f}",
+            file=out,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the invoice PDF generator and form totals.")
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this JSON file and fail on regressions")
+    parser.add_argument("--save-baseline", metavar="FILE", help="Write results to FILE as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown/growth ratio (default 0.25)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is kept")
+    parser.add_argument("--quick", action="store_true", help="Skip the 10k-item cases")
+    parser.add_argument("--check-determinism", action="store_true",
+                        help="Check that deterministic renders are byte-identical instead of timing")
+    # Used by --check-determinism for the run in a fresh interpreter
+    parser.add_argument("--case-hashes", metavar="LOGO", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case_hashes:
+        json.dump(case_hashes(args.case_hashes, args.quick), sys.stdout)
+        return 0
+    if args.check_determinism:
+        differing = check_determinism(quick=args.quick)
+        if differing:
+            print("NOT DETERMINISTIC:", file=sys.stderr)
+            for name in differing:
+                print(f"  {name}", file=sys.stderr)
+            return 1
+        print("Deterministic renders are byte-identical across runs and processes")
+        return 0
+
+    suite = run_suite(quick=args.quick, repeat=args.repeat)
+    print_results(suite)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(suite, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(suite, baseline, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
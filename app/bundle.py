@@ -0,0 +1,140 @@
+# app/bundle.py
+#
+# Archive output for bulk exports. Rendered invoices are written straight
+# into a ZIP or tar archive (a file path or any writable binary stream)
+# instead of going to disk as loose PDFs first, and a manifest.json listing
+# every member is added when the bundle is closed.
+
+import hashlib
+import io
+import json
+import os
+import posixpath
+import tarfile
+import time
+import zipfile
+
+MANIFEST_NAME = "manifest.json"
+# Extension -> tarfile write mode; anything else is written as a ZIP
+TAR_MODES = {".tar": "w", ".tar.gz": "w:gz", ".tgz": "w:gz"}
+
+
+def bundle_format(path):
+    lowered = str(path).lower()
+    for ext in sorted(TAR_MODES, key=len, reverse=True):
+        if lowered.endswith(ext):
+            return ext
+    return ".zip"
+
+
+class _Digest:
+    # Write-through wrapper that counts and hashes what passes through it
+
+    def __init__(self, f):
+        self.f = f
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        self.sha256.update(data)
+        return self.f.write(data)
+
+
+class BundleWriter:
+
+    def __init__(self, target, fmt=None):
+        # target is a path or a writable binary stream; fmt is ".zip", ".tar",
+        # ".tar.gz" or ".tgz" and defaults to the path's extension (ZIP for streams)
+        self.target = target
+        self.format = fmt or (bundle_format(target) if isinstance(target, (str, os.PathLike)) else ".zip")
+        self.entries = []
+        self._names = set()
+        self._zip = self._tar = None
+        if self.format in TAR_MODES:
+            mode = TAR_MODES[self.format]
+            if isinstance(target, (str, os.PathLike)):
+                self._tar = tarfile.open(target, mode)
+            else:
+                # Stream mode never seeks, so pipes and sockets work too
+                self._tar = tarfile.open(fileobj=target, mode=mode.replace(":", "|") if ":" in mode else "w|")
+        else:
+            # PDF pages are already compressed; deflating them again costs
+            # time for almost no size
+            self._zip = zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _member_name(self, name):
+        # Flat, unique names inside the archive
+        name = posixpath.basename(str(name).replace("\\", "/")) or "invoice.pdf"
+        base, ext = posixpath.splitext(name)
+        candidate, n = name, 1
+        while candidate in self._names or candidate == MANIFEST_NAME:
+            n += 1
+            candidate = f"{base}_{n}{ext}"
+        self._names.add(candidate)
+        return candidate
+
+    def _record(self, name, size, sha256, invoice, index):
+        entry = {"name": name, "size": size, "sha256": sha256}
+        if index is not None:
+            entry["index"] = index
+        if invoice is not None:
+            entry.update(
+                client_name=invoice.client_name,
+                date=invoice.date.isoformat() if invoice.date else invoice.date_text,
+                status=invoice.status,
+                subtotal_centavos=invoice.subtotal_centavos,
+            )
+        self.entries.append(entry)
+
+    def add(self, name, data, invoice=None, index=None):
+        # Adds already rendered PDF bytes; returns the member name used
+        name = self._member_name(name)
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._tar.addfile(info, io.BytesIO(data))
+        self._record(name, len(data), hashlib.sha256(data).hexdigest(), invoice, index)
+        return name
+
+    def add_invoice(self, name, invoice, index=None, stats=None):
+        # Renders invoice directly into the archive. ZIP members are written
+        # as the PDF is produced; tar needs the size up front, so the PDF is
+        # rendered to memory first.
+        from app.ui.models import as_invoice
+        from app.ui.pdf_generator import generate_invoice_pdf, render_invoice_bytes
+        invoice = as_invoice(invoice)
+        if self._zip is None:
+            return self.add(name, render_invoice_bytes(invoice, stats=stats), invoice, index)
+        name = self._member_name(name)
+        with self._zip.open(name, "w") as member:
+            digest = _Digest(member)
+            generate_invoice_pdf(invoice, digest, stats=stats)
+        self._record(name, digest.size, digest.sha256.hexdigest(), invoice, index)
+        return name
+
+    def close(self):
+        if self._zip is None and self._tar is None:
+            return
+        # Members are added as renders finish; list them in input order
+        entries = sorted(self.entries, key=lambda entry: entry.get("index", 0))
+        manifest = json.dumps({"count": len(entries), "invoices": entries}, indent=1).encode("utf-8")
+        if self._zip is not None:
+            self._zip.writestr(MANIFEST_NAME, manifest, compress_type=zipfile.ZIP_DEFLATED)
+            self._zip.close()
+        else:
+            info = tarfile.TarInfo(MANIFEST_NAME)
+            info.size = len(manifest)
+            info.mtime = int(time.time())
+            self._tar.addfile(info, io.BytesIO(manifest))
+            self._tar.close()
+        self._zip = self._tar = None
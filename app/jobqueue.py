@@ -0,0 +1,397 @@
+# app/jobqueue.py
+#
+# Persistent job queue for bulk statement runs. Every invoice of a run is a
+# row in a SQLite database, so a run that dies halfway (full disk, bad logo
+# path, power cut) picks up where it stopped instead of starting over.
+# Several worker processes, or several `run` commands, can pull from the same
+# queue at once.
+#
+#   python -m app.jobqueue enqueue invoices.jsonl -o statements/
+#   python -m app.jobqueue run -w 4
+#   python -m app.jobqueue status
+#   python -m app.jobqueue retry          failed jobs get another round
+#   python -m app.jobqueue recover        after a crash, with no workers running
+#
+# Jobs are keyed by their output and content, so enqueueing the same input
+# again adds nothing and finished invoices are never rendered twice. A job is
+# marked done only once its PDF has been written completely.
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from app.ui.config_store import default_config_path
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATES = (QUEUED, RUNNING, DONE, FAILED)
+
+DEFAULT_MAX_ATTEMPTS = 3
+# Retry n waits BACKOFF_BASE * 2 ** (n - 1) seconds, at most BACKOFF_MAX
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 300.0
+# A running job not finished within this many seconds is assumed lost with
+# its worker and handed to another one
+LEASE_SECONDS = 600.0
+# How long an idle worker sleeps between checks for retries coming due
+IDLE_POLL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL,
+    error TEXT,
+    number TEXT,
+    created_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(state, available_at);
+"""
+# Matches a job only while it is still running under the caller's claim
+HELD = "WHERE id = ? AND state = ? AND claimed_by = ? AND attempts = ?"
+
+
+def default_queue_path():
+    # Kept next to the config file, like the ledger
+    return os.path.join(os.path.dirname(default_config_path()), "gba_jobs.sqlite3")
+
+
+def job_key(record, output_path):
+    # Same record rendered to the same file -> same key
+    canonical = json.dumps({"output": os.path.abspath(output_path), "record": record}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def backoff(attempts):
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+def _now_text():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+
+    def __init__(self, path=None):
+        self.path = path or default_queue_path()
+        # Workers wait for each other's short write transactions
+        self._conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def enqueue(self, jobs, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        # jobs: iterable of (payload dict, output_path). Jobs whose key is
+        # already queued are skipped; returns how many were added.
+        conn = self._conn
+        now = time.time()
+        created_at = _now_text()
+        added = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for payload, output_path in jobs:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (key, payload, output_path, state, max_attempts, available_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        job_key(payload, output_path), json.dumps(payload), os.path.abspath(output_path),
+                        QUEUED, max_attempts, now, created_at,
+                    ),
+                )
+                added += cursor.rowcount
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return added
+
+    def claim(self, worker_id, lease=LEASE_SECONDS):
+        # Takes the next job that is due, or one whose worker has gone quiet
+        # for longer than lease. Returns the job row as a dict, or None.
+        conn = self._conn
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, finished_at = ? "
+                "WHERE state = ? AND claimed_at < ? AND attempts >= max_attempts",
+                (FAILED, "Worker stopped before finishing", _now_text(), RUNNING, now - lease),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (state = ? AND available_at <= ?) OR (state = ? AND claimed_at < ?) "
+                "ORDER BY available_at, id LIMIT 1",
+                (QUEUED, now, RUNNING, now - lease),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, claimed_by = ?, claimed_at = ? WHERE id = ?",
+                    (RUNNING, worker_id, now, row["id"]),
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        job["claimed_by"] = worker_id
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    # complete() and fail() only apply while the caller still holds the job:
+    # once its lease has run out the job may belong to another worker, and
+    # they return False.
+
+    def complete(self, job, number=None):
+        cursor = self._conn.execute(
+            "UPDATE jobs SET state = ?, error = NULL, number = ?, finished_at = ? " + HELD,
+            (DONE, number, _now_text(), job["id"], RUNNING, job["claimed_by"], job["attempts"]),
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, job, error, retry=True):
+        # Schedules another attempt after a backoff, or gives up once the
+        # job has used all of them (or retry is False)
+        if retry and job["attempts"] < job["max_attempts"]:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, available_at = ?, claimed_by = NULL, claimed_at = NULL " + HELD,
+                (QUEUED, error, time.time() + backoff(job["attempts"]),
+                 job["id"], RUNNING, job["claimed_by"], job["attempts"]),
+            )
+        else:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, finished_at = ? " + HELD,
+                (FAILED, error, _now_text(), job["id"], RUNNING, job["claimed_by"], job["attempts"]),
+            )
+        return cursor.rowcount > 0
+
+    def retry_failed(self):
+        # Gives every failed job a fresh set of attempts
+        cursor = self._conn.execute(
+            "UPDATE jobs SET state = ?, attempts = 0, available_at = ?, finished_at = NULL WHERE state = ?",
+            (QUEUED, time.time(), FAILED),
+        )
+        return cursor.rowcount
+
+    def recover(self):
+        # Requeues jobs left running by workers that are gone. Only safe when
+        # no worker is using the queue.
+        cursor = self._conn.execute(
+            "UPDATE jobs SET state = ?, available_at = ?, claimed_by = NULL, claimed_at = NULL WHERE state = ?",
+            (QUEUED, time.time(), RUNNING),
+        )
+        return cursor.rowcount
+
+    def next_due(self):
+        # Seconds until the next queued job is due (0 if one is due now), or
+        # None when nothing is queued or running
+        row = self._conn.execute(
+            "SELECT MIN(available_at) FROM jobs WHERE state = ?", (QUEUED,)
+        ).fetchone()
+        if row[0] is not None:
+            return max(0.0, row[0] - time.time())
+        running = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (RUNNING,)).fetchone()[0]
+        return IDLE_POLL if running else None
+
+    def counts(self):
+        counts = dict.fromkeys(STATES, 0)
+        for state, count in self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+            counts[state] = count
+        return counts
+
+    def failures(self, limit=None):
+        sql = "SELECT id, output_path, attempts, error FROM jobs WHERE state = ? ORDER BY id"
+        params = (FAILED,)
+        if limit:
+            sql += " LIMIT ?"
+            params = (FAILED, limit)
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+
+def _render_job(job, deterministic):
+    # Writes next to the target and renames, so an interrupted render never
+    # leaves a partial PDF that looks finished. The temporary name is unique
+    # to this worker and attempt: a render that outlives its lease can still
+    # be running when another worker takes the job over.
+    from app.ui.models import Invoice
+    from app.ui.pdf_generator import generate_invoice_pdf
+    invoice = Invoice.from_dict(job["payload"])
+    output_path = job["output_path"]
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    part_path = f"{output_path}.{os.getpid()}-{job['attempts']}.part"
+    try:
+        generate_invoice_pdf(invoice, part_path, deterministic=deterministic)
+        os.replace(part_path, output_path)
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+    return invoice
+
+
+def run_worker(queue_path, ledger_path=None, deterministic=False, lease=LEASE_SECONDS):
+    # Pulls jobs until none are queued or running; returns (done, failed)
+    from app.ledger import Ledger
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    done = failed = 0
+    ledger = Ledger(ledger_path) if ledger_path else None
+    try:
+        with JobQueue(queue_path) as jobs:
+            while True:
+                job = jobs.claim(worker_id, lease)
+                if job is None:
+                    wait = jobs.next_due()
+                    if wait is None:
+                        break
+                    time.sleep(min(max(wait, 0.05), IDLE_POLL))
+                    continue
+                try:
+                    invoice = _render_job(job, deterministic)
+                except (ValueError, TypeError, AttributeError) as e:
+                    # Malformed data fails the same way every time
+                    failed += jobs.fail(job, f"{type(e).__name__}: {e}", retry=False)
+                    continue
+                except Exception as e:
+                    if jobs.fail(job, f"{type(e).__name__}: {e}"):
+                        failed += job["attempts"] >= job["max_attempts"]
+                    continue
+                number = None
+                if ledger is not None:
+                    # Keyed on the job, so a worker that dies between this and
+                    # complete() does not record the invoice twice on retry
+                    try:
+                        number = ledger.record(invoice, job["output_path"], job["key"])
+                    except Exception as e:
+                        if jobs.fail(job, f"Ledger: {type(e).__name__}: {e}"):
+                            failed += job["attempts"] >= job["max_attempts"]
+                        continue
+                # Not counted when the lease ran out and another worker has
+                # taken the job over
+                done += jobs.complete(job, number)
+    finally:
+        if ledger is not None:
+            ledger.close()
+    return done, failed
+
+
+def _worker_main(args):
+    return run_worker(*args)
+
+
+def enqueue_file(queue, input_path, out_dir, letterhead=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    # Validates the input a block at a time and queues the good records;
+    # records the batch renderer would reject are rejected here too, rather
+    # than failing once a worker gets to them. Returns (added, already
+    # queued, failures).
+    from app.batch import output_name, prepare_record, read_records, validated_records
+    failures = []
+    seen = [0]
+
+    def payloads():
+        for index, record in validated_records(read_records(input_path), failures):
+            try:
+                prepare_record(record, letterhead)
+            except Exception as e:
+                failures.append((index, f"{type(e).__name__}: {e}"))
+                continue
+            seen[0] += 1
+            payload = dict(letterhead or {})
+            payload.update(record)
+            payload.pop("output", None)
+            yield payload, os.path.join(out_dir, output_name(index, record))
+
+    added = queue.enqueue(payloads(), max_attempts)
+    failures.sort()
+    return added, seen[0] - added, failures
+
+
+def main(argv=None):
+    from app.batch import DEFAULT_CONFIG_PATH, load_letterhead
+    from app.ledger import default_ledger_path
+
+    parser = argparse.ArgumentParser(description="Resumable, multi-worker bulk rendering backed by SQLite.")
+    parser.add_argument("--queue", default=default_queue_path(), help="Job database (default: next to the config)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Queue every invoice of a CSV/JSONL file")
+    enqueue.add_argument("input", help="CSV or JSONL file with one invoice per row/line")
+    enqueue.add_argument("-o", "--out-dir", default="invoices", help="Directory for the generated PDFs")
+    enqueue.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="Letterhead config used for fields a record leaves out")
+    enqueue.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Tries per invoice before it fails")
+
+    run = commands.add_parser("run", help="Render queued invoices until the queue is drained")
+    run.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    run.add_argument("--deterministic", action="store_true", help="Byte-identical output for identical input")
+    run.add_argument("--ledger", default=default_ledger_path(), help="SQLite ledger the rendered invoices are recorded in")
+    run.add_argument("--no-ledger", action="store_true", help="Do not record rendered invoices in the ledger")
+
+    commands.add_parser("status", help="Show job counts and failures")
+    commands.add_parser("retry", help="Queue failed jobs again with fresh attempts")
+    commands.add_parser("recover", help="Requeue jobs left running by a crashed run (stop all workers first)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        import multiprocessing
+        workers = args.workers or os.cpu_count() or 1
+        job_args = (args.queue, None if args.no_ledger else args.ledger, args.deterministic)
+        start = time.perf_counter()
+        if workers == 1:
+            results = [run_worker(*job_args)]
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                results = pool.map(_worker_main, [job_args] * workers)
+        elapsed = time.perf_counter() - start
+        done = sum(result[0] for result in results)
+        print(f"Rendered {done} invoice(s) in {elapsed:.2f}s")
+
+    with JobQueue(args.queue) as queue:
+        if args.command == "enqueue":
+            added, existing, failures = enqueue_file(
+                queue, args.input, args.out_dir, load_letterhead(args.config), args.max_attempts
+            )
+            for index, error in failures:
+                print(f"record {index + 1}: {error}", file=sys.stderr)
+            print(f"Queued {added} invoice(s), {existing} already queued, {len(failures)} rejected")
+        elif args.command == "retry":
+            print(f"Requeued {queue.retry_failed()} failed job(s)")
+        elif args.command == "recover":
+            print(f"Requeued {queue.recover()} interrupted job(s)")
+        counts = queue.counts()
+        print(", ".join(f"{counts[state]} {state}" for state in STATES))
+        if args.command in ("status", "run"):
+            for job in queue.failures(limit=20):
+                print(f"  {job['output_path']} (attempt {job['attempts']}): {job['error']}", file=sys.stderr)
+        return 1 if counts[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
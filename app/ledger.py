@@ -0,0 +1,229 @@
+# app/ledger.py
+#
+# Local SQLite record of every generated invoice: number, client, date,
+# status, items, totals and where the PDF was written. Lookups by client,
+# date and status are served by indexes.
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime
+from decimal import Decimal
+
+from app.ui.config_store import default_config_path
+from app.ui.models import Invoice, LineItem
+from app.ui.validators import parse_date
+
+NUMBER_FORMAT = "GBA-{id:06d}"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY,
+    number TEXT NOT NULL UNIQUE,
+    client_name TEXT NOT NULL,
+    date TEXT,
+    date_text TEXT NOT NULL,
+    service TEXT NOT NULL,
+    status TEXT NOT NULL,
+    subtotal_centavos INTEGER,
+    item_count INTEGER NOT NULL,
+    output_path TEXT,
+    created_at TEXT NOT NULL,
+    job_key TEXT
+);
+CREATE TABLE IF NOT EXISTS items (
+    invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    qty TEXT NOT NULL,
+    unit_centavos INTEGER NOT NULL,
+    total_centavos INTEGER NOT NULL,
+    PRIMARY KEY (invoice_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS invoices_client ON invoices(client_name COLLATE NOCASE, date);
+CREATE INDEX IF NOT EXISTS invoices_date ON invoices(date);
+CREATE INDEX IF NOT EXISTS invoices_status ON invoices(status, date);
+"""
+# Created after the column migration below, for ledgers older than job_key
+JOB_KEY_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS invoices_job ON invoices(job_key) WHERE job_key IS NOT NULL"
+
+INVOICE_COLUMNS = (
+    "id, number, client_name, date, date_text, service, status, "
+    "subtotal_centavos, item_count, output_path, created_at"
+)
+
+
+def default_ledger_path():
+    # Kept next to the config file
+    return os.path.join(os.path.dirname(default_config_path()), "gba_ledger.sqlite3")
+
+
+def _date_key(value):
+    # ISO date string for range queries; accepts date objects or form text
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    parsed = parse_date(str(value))
+    if parsed is None:
+        raise ValueError(f"Invalid date: {value!r}")
+    return parsed.isoformat()
+
+
+class Ledger:
+
+    def __init__(self, path=None):
+        self.path = path or default_ledger_path()
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(invoices)")}
+        if "job_key" not in columns:
+            self._conn.execute("ALTER TABLE invoices ADD COLUMN job_key TEXT")
+        self._conn.execute(JOB_KEY_INDEX)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def bulk(self):
+        # Yields add(invoice, output_path, job_key=None) -> invoice number.
+        # Everything added is committed together when the block exits, or
+        # rolled back if it raises. An invoice recorded again under the same
+        # job_key keeps the number it already has.
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM invoices").fetchone()[0]
+            created_at = datetime.now().isoformat(timespec="seconds")
+
+            def add(invoice, output_path=None, job_key=None):
+                nonlocal next_id
+                if job_key is not None:
+                    row = conn.execute("SELECT number FROM invoices WHERE job_key = ?", (job_key,)).fetchone()
+                    if row is not None:
+                        return row["number"]
+                invoice_id = next_id
+                number = NUMBER_FORMAT.format(id=invoice_id)
+                # Lazily streamed items have already been consumed by the render
+                items = invoice.items if isinstance(invoice.items, tuple) else ()
+                conn.execute(
+                    f"INSERT INTO invoices ({INVOICE_COLUMNS}, job_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        invoice_id, number, invoice.client_name,
+                        invoice.date.isoformat() if invoice.date else None,
+                        invoice.date_text, invoice.service, invoice.status,
+                        invoice.subtotal_centavos, len(items),
+                        os.path.abspath(output_path) if output_path else None,
+                        created_at, job_key,
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (invoice_id, position, item.description, item.qty_display,
+                         item.unit_centavos, item.total_centavos)
+                        for position, item in enumerate(items)
+                    ],
+                )
+                next_id += 1
+                return number
+
+            yield add
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def record(self, invoice, output_path=None, job_key=None):
+        with self.bulk() as add:
+            return add(invoice, output_path, job_key)
+
+    def record_many(self, entries):
+        # entries: iterable of (invoice, output_path); one transaction
+        with self.bulk() as add:
+            return [add(invoice, output_path) for invoice, output_path in entries]
+
+    def set_status(self, number, status):
+        cursor = self._conn.execute("UPDATE invoices SET status = ? WHERE number = ?", (status, number))
+        return cursor.rowcount > 0
+
+    def _query(self, where="", params=(), limit=None, order="date DESC, id DESC"):
+        sql = f"SELECT {INVOICE_COLUMNS} FROM invoices"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += " LIMIT ?"
+            params = (*params, limit)
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def client_history(self, client_name, limit=None):
+        return self._query("client_name = ? COLLATE NOCASE", (client_name,), limit)
+
+    def by_status(self, status, limit=None):
+        return self._query("status = ?", (status,), limit)
+
+    def between(self, start=None, end=None, status=None):
+        # Invoices dated from start to end inclusive (dates or date text)
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(_date_key(start))
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(_date_key(end))
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        return self._query(" AND ".join(clauses), tuple(params), order="date, id")
+
+    def iter_rows(self, sql, params=()):
+        # Streams rows of an arbitrary read-only query
+        yield from self._conn.execute(sql, params)
+
+    def get(self, number):
+        rows = self._query("number = ?", (number,))
+        if not rows:
+            return None
+        row = rows[0]
+        row["items"] = [
+            dict(item) for item in self._conn.execute(
+                "SELECT description, qty, unit_centavos, total_centavos FROM items "
+                "WHERE invoice_id = ? ORDER BY position",
+                (row["id"],),
+            )
+        ]
+        return row
+
+    def invoice(self, number, letterhead=None):
+        # Rebuilds an Invoice for reprinting; letterhead supplies the fields
+        # the ledger does not keep (header, footer, signatures, logo)
+        row = self.get(number)
+        if row is None:
+            return None
+        data = dict(letterhead or {})
+        data.update(
+            client_name=row["client_name"],
+            date=row["date_text"],
+            service=row["service"],
+            status=row["status"],
+        )
+        # Items keep the exact centavo amounts that were billed
+        items = tuple(
+            LineItem(item["description"], Decimal(item["qty"]), item["unit_centavos"], item["total_centavos"])
+            for item in row["items"]
+        )
+        return replace(
+            Invoice.from_dict(data),
+            items=items,
+            subtotal_centavos=sum(item.total_centavos for item in items),
+        )
@@ -1,7 +1,10 @@
 # app/main.py
 
+from app import startup
 import customtkinter as ctk
+startup.mark("customtkinter imported")
 from app.ui.form import create_billing_form  # We'll build this next in Step 3
+startup.mark("form imported")
 
 def start_app():
     # Setup appearance and theme
@@ -12,10 +15,12 @@ def start_app():
     root = ctk.CTk()
     root.title("GBA Law Office - Billing Invoice Generator")
     root.geometry("1280x720")
+    startup.mark("window created")
 
     # Add the billing form from ui/form.py
     form = create_billing_form(master=root)
     form.pack(padx=20, pady=20, fill="both", expand=True)
+    root.after_idle(startup.mark, "window shown")
 
     # Run the app
     root.mainloop()
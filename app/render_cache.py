@@ -0,0 +1,186 @@
+# app/render_cache.py
+#
+# Content-addressed store of rendered PDFs. The key is a hash of everything
+# that ends up on the page: the normalised invoice fields, its items with
+# their exact centavo amounts, the letterhead text and the bytes of the logo.
+# An unchanged invoice is served from disk instead of being rendered again.
+# The store is capped by total size and evicts the least recently used
+# entries first. It is best effort: a store that cannot be read or written
+# (full disk, read-only install directory) only costs the reuse, never the
+# render.
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from app.ui.config_store import default_config_path
+from app.ui.pdf_generator import logo_digest, render_invoice_bytes
+
+# Bump when a layout change makes previously cached PDFs stale
+RENDER_VERSION = 3
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_dir():
+    return os.path.join(os.path.dirname(default_config_path()), "gba_render_cache")
+
+
+def render_key(invoice):
+    # Returns the cache key of an Invoice, or None when its items are a lazy
+    # iterator (streamed statements are never cached)
+    if not isinstance(invoice.items, tuple):
+        return None
+    payload = invoice.to_dict()
+    payload["items"] = [
+        (item.description, item.qty_display, item.unit_centavos, item.total_centavos)
+        for item in invoice.items
+    ]
+    if invoice.logo_path:
+        # Drawn as "[Logo not found]" when it cannot be read
+        payload["logo_path"] = logo_digest(invoice.logo_path) or "missing"
+    payload["version"] = RENDER_VERSION
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        # key -> [size, last use]; scanned from disk on first use
+        self._entries = None
+        self._size = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pdf")
+
+    def _load(self):
+        self._entries = {}
+        self._size = 0
+        if not os.path.isdir(self.directory):
+            return
+        try:
+            for shard in os.scandir(self.directory):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith(".pdf"):
+                        continue
+                    st = entry.stat()
+                    self._entries[entry.name[:-4]] = [st.st_size, st.st_mtime]
+                    self._size += st.st_size
+        except OSError:
+            # Entries missed here are picked up as they are used
+            self.errors += 1
+
+    @property
+    def size(self):
+        if self._entries is None:
+            self._load()
+        return self._size
+
+    def get(self, key):
+        if key is None:
+            return None
+        if self._entries is None:
+            self._load()
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # The file's mtime records the last use, so the order survives restarts
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        entry = self._entries.get(key)
+        if entry is None:
+            # Written by another process since the scan
+            entry = self._entries[key] = [len(data), 0]
+            self._size += len(data)
+        entry[1] = time.time()
+        return data
+
+    def put(self, key, data):
+        if key is None:
+            return
+        if self._entries is None:
+            self._load()
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".gba_render_", suffix=".tmp", dir=os.path.dirname(path))
+        except OSError:
+            self.errors += 1
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException as e:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            if not isinstance(e, OSError):
+                raise
+            self.errors += 1
+            return
+        previous = self._entries.get(key)
+        if previous is not None:
+            self._size -= previous[0]
+        self._entries[key] = [len(data), time.time()]
+        self._size += len(data)
+        self.trim()
+
+    def trim(self):
+        # Evicts least recently used entries until the store fits max_bytes
+        if self.max_bytes is None or self._entries is None or self._size <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue  # Open elsewhere; tried again on the next trim
+            del self._entries[key]
+            self._size -= size
+            self.evictions += 1
+
+    def render(self, invoice, cancel=None, stats=None):
+        # PDF bytes for invoice, rendered only on a miss. Rendered in
+        # deterministic mode so a hit is byte-identical to a fresh render.
+        from app.ui.models import as_invoice
+        invoice = as_invoice(invoice)
+        key = render_key(invoice)
+        data = self.get(key)
+        if data is None:
+            data = render_invoice_bytes(invoice, cancel=cancel, stats=stats, deterministic=True)
+            self.put(key, data)
+        return data
+
+    def counters(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries or ()),
+            "bytes": self._size,
+        }
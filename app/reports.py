@@ -0,0 +1,270 @@
+# app/reports.py
+#
+# Receivables reporting. Invoices are streamed one at a time from the ledger
+# or a batch input file into running aggregates, so memory grows with the
+# number of clients and months, not with the number of invoices.
+#
+#   python -m app.reports                          summary from the ledger
+#   python -m app.reports --input invoices.jsonl   summary from a batch file
+#   python -m app.reports --csv reports/ --pdf receivables.pdf
+
+import argparse
+import csv
+import os
+import sys
+from datetime import date
+
+from app.ui.money import format_php
+from app.ui.validators import parse_date
+
+PAID = "paid"
+# Upper bound in days (inclusive) and label of each aging bucket
+AGING_BUCKETS = ((30, "0-30 days"), (60, "31-60 days"), (90, "61-90 days"), (None, "Over 90 days"))
+UNDATED = "Undated"
+
+
+def _bucket(age_days):
+    for limit, label in AGING_BUCKETS:
+        if limit is None or age_days <= limit:
+            return label
+
+
+def _pesos(centavos):
+    # Plain decimal amount for CSV files
+    sign = "-" if centavos < 0 else ""
+    pesos, cents = divmod(abs(centavos), 100)
+    return f"{sign}{pesos}.{cents:02d}"
+
+
+class ReceivablesReport:
+
+    def __init__(self, as_of=None):
+        self.as_of = as_of or date.today()
+        self.invoices = 0
+        self.billed = 0
+        self.outstanding = 0
+        # client -> [open count, open centavos, oldest open date, billed centavos]
+        self.clients = {}
+        # bucket label -> [count, centavos]
+        self.aging = {label: [0, 0] for _, label in AGING_BUCKETS}
+        self.aging[UNDATED] = [0, 0]
+        # "YYYY-MM" -> [count, billed, paid, outstanding]
+        self.months = {}
+
+    def add(self, client_name, invoice_date, status, centavos):
+        centavos = centavos or 0
+        is_open = status != PAID
+        self.invoices += 1
+        self.billed += centavos
+        client = self.clients.get(client_name)
+        if client is None:
+            client = self.clients[client_name] = [0, 0, None, 0]
+        client[3] += centavos
+        if invoice_date is not None:
+            key = f"{invoice_date.year:04d}-{invoice_date.month:02d}"
+            month = self.months.get(key)
+            if month is None:
+                month = self.months[key] = [0, 0, 0, 0]
+            month[0] += 1
+            month[1] += centavos
+            month[3 if is_open else 2] += centavos
+        if not is_open:
+            return
+        self.outstanding += centavos
+        client[0] += 1
+        client[1] += centavos
+        if invoice_date is not None and (client[2] is None or invoice_date < client[2]):
+            client[2] = invoice_date
+        bucket = self.aging[UNDATED if invoice_date is None else _bucket((self.as_of - invoice_date).days)]
+        bucket[0] += 1
+        bucket[1] += centavos
+
+    def feed(self, rows):
+        # rows: iterable of (client_name, date or None, status, centavos)
+        for row in rows:
+            self.add(*row)
+        return self
+
+    def client_rows(self):
+        # Clients with something outstanding, largest balance first
+        rows = [
+            (name, count, centavos, oldest, billed)
+            for name, (count, centavos, oldest, billed) in self.clients.items()
+            if count
+        ]
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        return rows
+
+    def aging_rows(self):
+        return [(label, count, centavos) for label, (count, centavos) in self.aging.items()]
+
+    def monthly_rows(self):
+        return [(month, *values) for month, values in sorted(self.months.items())]
+
+
+# --- Sources ---
+
+def ledger_rows(ledger):
+    for row in ledger.iter_rows("SELECT client_name, date, status, subtotal_centavos FROM invoices"):
+        invoice_date = date.fromisoformat(row["date"]) if row["date"] else None
+        yield row["client_name"], invoice_date, row["status"], row["subtotal_centavos"]
+
+
+def record_rows(records, skipped=None):
+    # Batch input records (as read by app.batch.read_records); records that
+    # cannot be read or whose items do not parse are counted in skipped[0]
+    # and left out
+    from app.ui.models import Invoice
+    for record in records:
+        if not isinstance(record, dict):
+            # Unreadable input lines
+            if skipped is not None:
+                skipped[0] += 1
+            continue
+        try:
+            invoice = Invoice.from_dict(record)
+        except (ValueError, TypeError, AttributeError):
+            if skipped is not None:
+                skipped[0] += 1
+            continue
+        yield invoice.client_name, invoice.date, invoice.status, invoice.subtotal_centavos
+
+
+# --- Exports ---
+
+def write_csv(report, directory):
+    # Writes one CSV per section and returns their paths
+    os.makedirs(directory, exist_ok=True)
+    sections = {
+        "outstanding_by_client.csv": (
+            ["client_name", "open_invoices", "outstanding", "oldest_open_date", "billed"],
+            (
+                (name, count, _pesos(centavos), oldest.isoformat() if oldest else "", _pesos(billed))
+                for name, count, centavos, oldest, billed in report.client_rows()
+            ),
+        ),
+        "aging.csv": (
+            ["bucket", "invoices", "outstanding"],
+            ((label, count, _pesos(centavos)) for label, count, centavos in report.aging_rows()),
+        ),
+        "monthly_totals.csv": (
+            ["month", "invoices", "billed", "paid", "outstanding"],
+            (
+                (month, count, _pesos(billed), _pesos(paid), _pesos(outstanding))
+                for month, count, billed, paid, outstanding in report.monthly_rows()
+            ),
+        ),
+    }
+    paths = []
+    for name, (header, rows) in sections.items():
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        paths.append(path)
+    return paths
+
+
+def write_pdf(report, filename, title="Receivables Summary"):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#e0e0e0")),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ])
+
+    def table(header, rows):
+        return Table([header, *rows], repeatRows=1, style=table_style, hAlign="LEFT")
+
+    story = [
+        Paragraph(title, styles["Title"]),
+        Paragraph(
+            f"As of {report.as_of.strftime('%B %d, %Y')}: {report.invoices} invoice(s), "
+            f"{format_php(report.billed)} billed, {format_php(report.outstanding)} outstanding",
+            styles["Normal"],
+        ),
+        Spacer(1, 0.2 * inch),
+        Paragraph("Aging", styles["Heading2"]),
+        table(["Bucket", "Invoices", "Outstanding"], [
+            (label, count, format_php(centavos)) for label, count, centavos in report.aging_rows()
+        ]),
+        Spacer(1, 0.2 * inch),
+        Paragraph("Monthly Totals", styles["Heading2"]),
+        table(["Month", "Invoices", "Billed", "Paid", "Outstanding"], [
+            (month, count, format_php(billed), format_php(paid), format_php(outstanding))
+            for month, count, billed, paid, outstanding in report.monthly_rows()
+        ]),
+        Spacer(1, 0.2 * inch),
+        Paragraph("Outstanding by Client", styles["Heading2"]),
+        table(["Client", "Open", "Outstanding", "Oldest"], [
+            (name, count, format_php(centavos), oldest.strftime('%b %d, %Y') if oldest else "")
+            for name, count, centavos, oldest, _ in report.client_rows()
+        ]),
+    ]
+    doc = SimpleDocTemplate(
+        filename, pagesize=A4, title=title,
+        leftMargin=0.75 * inch, rightMargin=0.75 * inch, topMargin=0.75 * inch, bottomMargin=0.75 * inch,
+    )
+    doc.build(story)
+
+
+def print_report(report, out=sys.stdout):
+    print(f"{report.invoices} invoice(s), {format_php(report.billed)} billed, "
+          f"{format_php(report.outstanding)} outstanding as of {report.as_of.isoformat()}", file=out)
+    print("\nAging", file=out)
+    for label, count, centavos in report.aging_rows():
+        print(f"  {label:<14}{count:>8}  {format_php(centavos)}", file=out)
+    print("\nTop outstanding clients", file=out)
+    for name, count, centavos, oldest, _ in report.client_rows()[:10]:
+        print(f"  {name[:30]:<30}{count:>6}  {format_php(centavos)}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Receivables, aging and monthly totals from the ledger or a batch file.")
+    parser.add_argument("--ledger", help="Ledger database (default: the app's ledger)")
+    parser.add_argument("--input", help="Report on a CSV/JSONL batch input file instead of the ledger")
+    parser.add_argument("--as-of", help="Age invoices as of this date (default: today)")
+    parser.add_argument("--csv", metavar="DIR", help="Write the report sections as CSV files into DIR")
+    parser.add_argument("--pdf", metavar="FILE", help="Write a PDF summary")
+    args = parser.parse_args(argv)
+
+    as_of = None
+    if args.as_of:
+        as_of = parse_date(args.as_of)
+        if as_of is None:
+            parser.error(f"invalid --as-of date: {args.as_of}")
+    report = ReceivablesReport(as_of)
+    skipped = [0]
+    if args.input:
+        from app.batch import read_records
+        report.feed(record_rows(read_records(args.input), skipped))
+    else:
+        from app.ledger import Ledger
+        with Ledger(args.ledger) as ledger:
+            report.feed(ledger_rows(ledger))
+
+    print_report(report)
+    if skipped[0]:
+        print(f"\nSkipped {skipped[0]} unreadable or invalid record(s)", file=sys.stderr)
+    if args.csv:
+        for path in write_csv(report, args.csv):
+            print(f"Wrote {path}")
+    if args.pdf:
+        write_pdf(report, args.pdf)
+        print(f"Wrote {args.pdf}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+# app/service.py
+#
+# Local HTTP render service for programmatic intake. Invoice JSON in the
+# shape the form builds is rendered by a pool of warm worker processes and
+# the PDF bytes are returned. Only the standard library is used and it binds
+# to localhost by default.
+#
+#   python -m app.service --port 8765
+#
+#   POST /invoice    invoice JSON -> application/pdf
+#                    (?deterministic=1 for byte-identical output)
+#   GET  /metrics    latency percentiles, queue depth and counters (JSON)
+#   GET  /health     "ok"
+#
+# At most workers + queue requests are accepted at once; beyond that the
+# service answers 429 with Retry-After. A render that takes longer than the
+# timeout answers 504; its slot is freed only once the worker is done.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from app.ui.models import Invoice
+from app.ui.render_stats import percentile
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE = 32
+DEFAULT_TIMEOUT = 30.0
+MAX_BODY_BYTES = 5 * 1024 * 1024
+# Latencies kept for the percentiles in /metrics
+LATENCY_WINDOW = 1000
+
+
+def _warm_worker():
+    # Runs once in each worker process: imports reportlab and builds the
+    # fonts and styles so the first request does not pay for them
+    from app.ui.pdf_generator import render_invoice_bytes
+    render_invoice_bytes(Invoice())
+
+
+def _render(invoice, deterministic):
+    from app.ui.pdf_generator import render_invoice_bytes
+    return render_invoice_bytes(invoice, deterministic=deterministic)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class RenderService:
+
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE, timeout=DEFAULT_TIMEOUT, letterhead=None):
+        self.workers = workers or min(DEFAULT_WORKERS, os.cpu_count() or 1)
+        self.capacity = self.workers + queue_size
+        self.timeout = timeout
+        self.letterhead = letterhead or {}
+        self._lock = threading.Lock()
+        # Requests holding a slot: queued, rendering, or timed out but still
+        # running in a worker (those are also counted in _abandoned)
+        self._accepted = 0
+        self._abandoned = 0
+        self._pool = self._new_pool()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {"requests": 0, "rendered": 0, "rejected": 0, "timeouts": 0, "invalid": 0, "errors": 0}
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _release(self, future=None):
+        with self._lock:
+            self._accepted -= 1
+
+    def _release_abandoned(self, future):
+        with self._lock:
+            self._abandoned -= 1
+
+    def _replace_broken(self, pool, error):
+        # A worker that died (e.g. killed by the OS) breaks the whole pool;
+        # the next request gets a fresh one
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = self._new_pool()
+
+    def prepare(self, data):
+        # Invoice from request JSON, with letterhead fields it leaves out
+        # taken from the config; raises ValueError for malformed input
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+        merged = dict(self.letterhead)
+        merged.update(data)
+        return Invoice.from_dict(merged)
+
+    def render(self, invoice, deterministic=False):
+        # Returns PDF bytes; raises QueueFull when at capacity and
+        # concurrent.futures.TimeoutError when the render is too slow
+        with self._lock:
+            if self._accepted >= self.capacity:
+                self.counters["rejected"] += 1
+                raise QueueFull()
+            self._accepted += 1
+        start = time.perf_counter()
+        pool = self._pool
+        try:
+            future = pool.submit(_render, invoice, deterministic)
+        except BaseException as e:
+            self._release()
+            self._replace_broken(pool, e)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            pdf_bytes = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Drop it if it has not started. A render already running keeps
+            # its worker busy, so its slot stays taken until the done
+            # callback above runs when it really finishes.
+            if not future.cancel():
+                with self._lock:
+                    self._abandoned += 1
+                future.add_done_callback(self._release_abandoned)
+            self.count("timeouts")
+            raise
+        except BaseException as e:
+            self._replace_broken(pool, e)
+            raise
+        with self._lock:
+            self.latencies.append(time.perf_counter() - start)
+            self.counters["rendered"] += 1
+        return pdf_bytes
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            accepted = self._accepted
+            abandoned = self._abandoned
+            data = dict(self.counters)
+        data.update(
+            workers=self.workers,
+            capacity=self.capacity,
+            in_flight=accepted,
+            # Timed-out renders still occupying a worker
+            abandoned=abandoned,
+            queue_depth=max(0, accepted - self.workers),
+        )
+        if latencies:
+            data["latency_ms"] = {
+                f"p{round(fraction * 100)}": round(percentile(latencies, fraction) * 1000, 1)
+                for fraction in (0.5, 0.9, 0.99)
+            }
+            data["latency_ms"]["max"] = round(latencies[-1] * 1000, 1)
+        return data
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    server_version = "GBARender/1.0"
+    # Set on the subclass created by make_server
+    service = None
+
+    def _send(self, status, body, content_type="application/json", headers=()):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=()):
+        self._send(status, {"error": message}, headers=headers)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/metrics":
+            self._send(HTTPStatus.OK, self.service.metrics())
+        elif path == "/health":
+            self._send(HTTPStatus.OK, "ok", "text/plain")
+        else:
+            self._error(HTTPStatus.NOT_FOUND, "Not found")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/invoice":
+            self._error(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        service = self.service
+        service.count("requests")
+        header = self.headers.get("Content-Length")
+        if header is None:
+            self._error(HTTPStatus.LENGTH_REQUIRED, "Content-Length required")
+            return
+        try:
+            length = int(header)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # rfile.read(-1) would read until the client closes
+            self._error(HTTPStatus.BAD_REQUEST, f"Invalid Content-Length: {header!r}")
+            return
+        if length > MAX_BODY_BYTES:
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body larger than {MAX_BODY_BYTES} bytes")
+            return
+        try:
+            invoice = service.prepare(json.loads(self.rfile.read(length)))
+        except (ValueError, TypeError, AttributeError) as e:
+            service.count("invalid")
+            self._error(HTTPStatus.BAD_REQUEST, f"Invalid invoice: {e}")
+            return
+        deterministic = parse_qs(url.query).get("deterministic", ["0"])[-1] not in ("0", "", "false")
+        try:
+            pdf_bytes = service.render(invoice, deterministic)
+        except QueueFull:
+            self._error(HTTPStatus.TOO_MANY_REQUESTS, "Render queue is full", headers=(("Retry-After", "1"),))
+            return
+        except FutureTimeout:
+            self._error(HTTPStatus.GATEWAY_TIMEOUT, f"Render took longer than {service.timeout:g}s")
+            return
+        except Exception as e:
+            service.count("errors")
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+            return
+        self._send(HTTPStatus.OK, pdf_bytes, "application/pdf")
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, quiet=False):
+    handler = type("BoundRenderHandler", (RenderHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.quiet = quiet
+    return server
+
+
+def main(argv=None):
+    from app.batch import DEFAULT_CONFIG_PATH, load_letterhead
+
+    parser = argparse.ArgumentParser(description="Serve invoice rendering over local HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Render worker processes (default: up to 4)")
+    parser.add_argument("--queue", type=int, default=DEFAULT_QUEUE, help="Requests allowed to wait for a worker before 429")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds before a render answers 504")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="Letterhead config used for fields a request leaves out")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not log requests")
+    args = parser.parse_args(argv)
+
+    service = RenderService(args.workers, args.queue, args.timeout, load_letterhead(args.config))
+    server = make_server(service, args.host, args.port, args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_port} with {service.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# app/startup.py
+#
+# Cold start timing. Phases are marked as the app comes up; set
+# GBA_STARTUP_REPORT=1 to print them to stderr once startup has finished, or
+# set it to a file path to append them there as one JSON line (the packaged
+# EXE has no console).
+
+import json
+import os
+import sys
+import threading
+import time
+
+_start = time.perf_counter()
+_marks = []
+_lock = threading.Lock()
+
+
+def mark(name):
+    with _lock:
+        _marks.append((name, time.perf_counter() - _start))
+
+
+def marks():
+    with _lock:
+        return list(_marks)
+
+
+def report():
+    target = os.environ.get("GBA_STARTUP_REPORT")
+    if not target:
+        return
+    phases = marks()
+    if target == "1":
+        if sys.stderr is None:
+            return
+        previous = 0.0
+        print("Startup (ms since launch / phase):", file=sys.stderr)
+        for name, at in phases:
+            print(f"  {at * 1000:8.1f} {(at - previous) * 1000:8.1f}  {name}", file=sys.stderr)
+            previous = at
+        return
+    entry = {
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "phases": [{"name": name, "ms": round(at * 1000, 1)} for name, at in phases],
+    }
+    try:
+        with open(target, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError:
+        pass
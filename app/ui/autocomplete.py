@@ -0,0 +1,241 @@
+import heapq
+import json
+import os
+import tempfile
+from bisect import bisect_left
+
+from app.ui.config_store import default_config_path
+
+# Client names and item descriptions from past invoices, suggested as the
+# user types. The counts are built from the ledger and cached in a small JSON
+# file that is only read on first use and topped up with invoices added to
+# the ledger since it was written.
+
+SUGGESTION_LIMIT = 8
+# Results for prefixes up to this length are cached; they match the most
+# entries and are typed the most often
+CACHED_PREFIX_LENGTH = 2
+KINDS = ("client_name", "description")
+
+
+def default_suggestions_path():
+    return os.path.join(os.path.dirname(default_config_path()), "gba_autocomplete.json")
+
+
+def _normalize(text):
+    return " ".join(str(text).split())
+
+
+class PrefixIndex:
+    # Case-insensitive prefix search over a sorted array of folded keys; the
+    # matching slice is found with two bisects and ranked by frequency
+
+    def __init__(self, counts=None):
+        self.counts = {}
+        self._keys = []
+        self._texts = []
+        self._dirty = False
+        self._cache = {}
+        for text, count in (counts or {}).items():
+            self.add(text, count)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, text, count=1):
+        text = _normalize(text)
+        if not text:
+            return
+        self.counts[text] = self.counts.get(text, 0) + count
+        self._dirty = True
+
+    def _rebuild(self):
+        self._texts = sorted(self.counts, key=str.casefold)
+        self._keys = [text.casefold() for text in self._texts]
+        self._cache.clear()
+        self._dirty = False
+
+    def suggest(self, prefix, limit=SUGGESTION_LIMIT):
+        key = str(prefix).lstrip().casefold()
+        if not key:
+            return []
+        if self._dirty:
+            self._rebuild()
+        cached = len(key) <= CACHED_PREFIX_LENGTH
+        if cached and (key, limit) in self._cache:
+            return self._cache[(key, limit)]
+        keys = self._keys
+        lo = bisect_left(keys, key)
+        hi = bisect_left(keys, key + "\U0010ffff", lo)
+        # The text already typed in full is not worth suggesting
+        matches = (text for text, folded in zip(self._texts[lo:hi], keys[lo:hi]) if folded != key)
+        result = heapq.nlargest(limit, matches, key=self.counts.__getitem__)
+        if cached:
+            self._cache[(key, limit)] = result
+        return result
+
+
+class SuggestionStore:
+
+    def __init__(self, path=None, ledger_path=None):
+        self.path = path or default_suggestions_path()
+        self.ledger_path = ledger_path
+        self._indexes = None
+        # Highest ledger invoice id already counted
+        self._ledger_id = 0
+        self._dirty = False
+
+    @property
+    def loaded(self):
+        return self._indexes is not None
+
+    def _load(self):
+        self._indexes = {kind: PrefixIndex() for kind in KINDS}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for kind in KINDS:
+                index = self._indexes[kind]
+                for text, count in data.get(kind, ()):
+                    index.add(text, count)
+            self._ledger_id = int(data.get("ledger_id", 0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            self._indexes = {kind: PrefixIndex() for kind in KINDS}
+            self._ledger_id = 0
+        self.sync()
+
+    def index(self, kind):
+        if self._indexes is None:
+            self._load()
+        return self._indexes[kind]
+
+    def suggest(self, kind, prefix, limit=SUGGESTION_LIMIT):
+        return self.index(kind).suggest(prefix, limit)
+
+    def sync(self):
+        # Counts invoices added to the ledger since the last sync
+        if self._indexes is None:
+            return
+        from app.ledger import Ledger, default_ledger_path
+        ledger_path = self.ledger_path or default_ledger_path()
+        if not os.path.exists(ledger_path):
+            return
+        with Ledger(ledger_path) as ledger:
+            if next(ledger.iter_rows("SELECT COALESCE(MAX(id), 0) FROM invoices"))[0] < self._ledger_id:
+                # The ledger was replaced; count it again from the start
+                self._indexes = {kind: PrefixIndex() for kind in KINDS}
+                self._ledger_id = 0
+                self._dirty = True
+            last_id = self._ledger_id
+            names = self._indexes["client_name"]
+            for row in ledger.iter_rows(
+                "SELECT client_name, COUNT(*), MAX(id) FROM invoices WHERE id > ? GROUP BY client_name", (last_id,)
+            ):
+                names.add(row[0], row[1])
+                self._ledger_id = max(self._ledger_id, row[2])
+            descriptions = self._indexes["description"]
+            for row in ledger.iter_rows(
+                "SELECT description, COUNT(*) FROM items WHERE invoice_id > ? GROUP BY description", (last_id,)
+            ):
+                descriptions.add(row[0], row[1])
+        if self._ledger_id != last_id:
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {"ledger_id": self._ledger_id}
+        for kind, index in self._indexes.items():
+            data[kind] = sorted(index.counts.items(), key=lambda entry: -entry[1])
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".gba_autocomplete_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self._dirty = False
+
+
+def attach_autocomplete(entry, suggest, limit=SUGGESTION_LIMIT):
+    # Shows a dropdown of suggest(text, limit) under entry as the user types.
+    # Up/Down move through it, Return or a click picks one, Escape closes it.
+    import tkinter as tk
+
+    popup = {"window": None, "listbox": None}
+
+    def hide(event=None):
+        if popup["window"] is not None:
+            popup["window"].destroy()
+            popup["window"] = popup["listbox"] = None
+
+    def choose(text):
+        entry.delete(0, "end")
+        entry.insert(0, text)
+        entry.icursor("end")
+        hide()
+
+    def on_click(event):
+        listbox = popup["listbox"]
+        choose(listbox.get(listbox.nearest(event.y)))
+        return "break"
+
+    def show(matches):
+        if popup["window"] is None:
+            window = tk.Toplevel(entry)
+            window.wm_overrideredirect(True)
+            window.attributes("-topmost", True)
+            listbox = tk.Listbox(window, exportselection=False, activestyle="none", font=("Segoe UI", 11))
+            listbox.pack(fill="both", expand=True)
+            listbox.bind("<Button-1>", on_click)
+            popup["window"], popup["listbox"] = window, listbox
+        window, listbox = popup["window"], popup["listbox"]
+        listbox.delete(0, "end")
+        for text in matches:
+            listbox.insert("end", text)
+        listbox.configure(height=len(matches))
+        window.update_idletasks()
+        window.geometry(
+            f"{entry.winfo_width()}x{listbox.winfo_reqheight()}"
+            f"+{entry.winfo_rootx()}+{entry.winfo_rooty() + entry.winfo_height()}"
+        )
+
+    def on_key(event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        matches = suggest(entry.get(), limit)
+        if matches:
+            show(matches)
+        else:
+            hide()
+
+    def move(step):
+        listbox = popup["listbox"]
+        if listbox is None:
+            return None
+        selection = listbox.curselection()
+        if selection:
+            position = max(0, min(listbox.size() - 1, selection[0] + step))
+        else:
+            position = 0 if step > 0 else listbox.size() - 1
+        listbox.selection_clear(0, "end")
+        listbox.selection_set(position)
+        listbox.see(position)
+        return "break"
+
+    def on_return(event):
+        listbox = popup["listbox"]
+        if listbox is not None and listbox.curselection():
+            choose(listbox.get(listbox.curselection()[0]))
+            return "break"
+        return None
+
+    entry.bind("<KeyRelease>", on_key, add="+")
+    entry.bind("<Down>", lambda event: move(1), add="+")
+    entry.bind("<Up>", lambda event: move(-1), add="+")
+    entry.bind("<Return>", on_return, add="+")
+    entry.bind("<Escape>", hide, add="+")
+    # Late enough for a click on the list to land first
+    entry.bind("<FocusOut>", lambda event: entry.after(150, hide), add="+")
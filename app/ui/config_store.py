@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import tempfile
+
+# Letterhead and signature fields persisted between sessions
+CONFIG_FIELDS = (
+    "header",
+    "footer",
+    "body_message",
+    "company_contact",
+    "contact_message",
+    "receiver",
+    "position",
+    "attorney",
+    "logo_path",
+)
+
+# Edits within this window are written together
+DEBOUNCE_MS = 1000
+
+
+def default_config_path():
+    if getattr(sys, 'frozen', False):
+        # Running as bundled EXE
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, "gba_billing_config.json")
+
+
+class ConfigStore:
+    # Cached, dirty-tracked access to the config file.
+    #
+    # update() only records fields whose value actually changed and schedules
+    # a single write DEBOUNCE_MS later through schedule/cancel (e.g. a Tk
+    # widget's after/after_cancel). Writes go to a temp file that replaces
+    # the config atomically. Without a scheduler every update writes at once.
+
+    def __init__(self, path, schedule=None, cancel=None, debounce_ms=DEBOUNCE_MS):
+        self.path = path
+        self._schedule = schedule
+        self._cancel = cancel
+        self._debounce_ms = debounce_ms
+        self._data = {}
+        self._mtime = None
+        self._dirty = set()
+        self._pending = None
+
+    def _read(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._data = {key: self._data[key] for key in self._dirty}
+            self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except Exception:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        # Unsaved edits win over what is on disk
+        data.update({key: self._data[key] for key in self._dirty})
+        self._data = data
+        self._mtime = mtime
+
+    def load(self):
+        # Re-reads the file only when its mtime changed; unsaved edits win
+        self._read()
+        return dict(self._data)
+
+    def get(self, key, default=None):
+        self._read()
+        return self._data.get(key, default)
+
+    def update(self, values):
+        self._read()
+        for key, value in values.items():
+            if self._data.get(key) != value:
+                self._data[key] = value
+                self._dirty.add(key)
+        if not self._dirty:
+            return
+        if self._schedule is None:
+            self.flush()
+            return
+        if self._pending is not None and self._cancel is not None:
+            self._cancel(self._pending)
+        self._pending = self._schedule(self._debounce_ms, self.flush)
+
+    def flush(self):
+        self._pending = None
+        if not self._dirty:
+            return
+        # Merge onto the file as it is now so fields changed elsewhere survive
+        self._mtime = None
+        self._read()
+        directory = os.path.dirname(self.path) or "."
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".gba_config_", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self._data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except Exception:
+            # Keep the edits dirty so the next flush retries them
+            return
+        self._dirty.clear()
+        self._mtime = os.path.getmtime(self.path)
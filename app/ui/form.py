@@ -2,7 +2,12 @@ import customtkinter as ctk
 from datetime import datetime
 import tempfile
 import os
-import webbrowser
+import queue
+import threading
+import hashlib
+import json
+import atexit
+from itertools import count
 from tkinter import filedialog, messagebox
 from app.ui.validators import (
     validate_required,
@@ -11,9 +16,20 @@ from app.ui.validators import (
     validate_date,
     validate_name
 )
-from app.ui.pdf_generator import generate_invoice_pdf
+from app.ui.money import RunningTotal, line_centavos, format_php
+from app.ui.config_store import ConfigStore, default_config_path
+from app.ui.models import Invoice
+from app.ui.autocomplete import SuggestionStore, attach_autocomplete
+from app import startup
 
-def create_billing_form(master):
+# Line-item widgets kept alive at once, and rows moved per wheel notch
+ITEM_POOL_SIZE = 10
+ITEM_WHEEL_ROWS = 3
+
+def _build_billing_form(master):
+    # Generator: builds the form a few sections at a time. The first step
+    # builds what is visible when the window opens and yields main_frame; the
+    # rest are run from the event loop once the window is up.
     # Main container with scrollable frame
     main_frame = ctk.CTkFrame(master, corner_radius=15)
     main_frame.pack(fill="both", expand=True, padx=15, pady=15)
@@ -67,19 +83,26 @@ def create_billing_form(master):
                 show_error("attorney", "Invalid attorney name")
         
         # Validate billing items
+        sync_visible_rows()
         valid_items = []
         for i, row in enumerate(item_rows):
-            desc = row['desc_entry'].get()
-            qty = row['qty_entry'].get()
-            amount = row['amount_entry'].get()
+            desc = row['description']
+            qty = row['qty']
+            amount = row['amount']
+            row_errors = []
             if desc:  # Only validate if description exists
                 if not validate_quantity(qty):
                     show_error(f"item_qty_{i}", "Quantity must be positive number")
+                    row_errors.append("Quantity must be positive number")
                 if not validate_currency(amount):
                     show_error(f"item_amount_{i}", "Invalid amount")
+                    row_errors.append("Invalid amount")
                 valid_items.append(True)
+            row['error'] = "; ".join(row_errors)
         if not any(valid_items):
             show_error("items", "At least one valid billing item is required")
+        # Show the row errors on whichever rows are in view
+        refresh_items()
         
         return len(validation_errors) == 0
     
@@ -137,26 +160,15 @@ def create_billing_form(master):
     
 
     # --- Configuration Section (Persistent) ---
-    import json
-    import sys
-    if getattr(sys, 'frozen', False):
-        # Running as bundled EXE
-        BASE_DIR = os.path.dirname(sys.executable)
-    else:
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    CONFIG_PATH = os.path.join(BASE_DIR, "gba_billing_config.json")
+    # Writes are debounced through Tk's event loop and only happen when a
+    # field actually changed
+    config_store = ConfigStore(default_config_path(), schedule=master.after, cancel=master.after_cancel)
 
     def load_config():
-        if os.path.exists(CONFIG_PATH):
-            try:
-                with open(CONFIG_PATH, "r") as f:
-                    return json.load(f)
-            except Exception:
-                return {}
-        return {}
+        return config_store.load()
 
     def save_config():
-        config = {
+        config_store.update({
             "header": entry_header.get("1.0", "end").strip(),
             "footer": entry_footer.get("1.0", "end").strip(),
             "body_message": entry_body.get("1.0", "end").strip(),
@@ -166,14 +178,62 @@ def create_billing_form(master):
             "position": entry_position.get(),
             "attorney": entry_attorney.get(),
             "logo_path": entry_logo_path.get()
-        }
+        })
+
+    # Work that has to happen before the window goes away. The close button
+    # runs it while the fields can still be read; a <Destroy> on the toplevel
+    # covers the window being destroyed some other way. (main_frame cannot
+    # be used: CTkFrame.bind goes to its inner canvas, so event.widget is
+    # never main_frame.)
+    toplevel = master.winfo_toplevel()
+    close_hooks = []
+
+    def run_close_hooks():
+        while close_hooks:
+            hook = close_hooks.pop(0)
+            try:
+                hook()
+            except Exception:
+                pass  # Never keep the window from closing
+
+    def on_close_request():
+        if form_state["built"]:
+            # Picks up an edit whose FocusOut never fired
+            save_config()
+        run_close_hooks()
+        toplevel.destroy()
+
+    def on_toplevel_destroy(event):
+        if event.widget is toplevel:
+            run_close_hooks()
+
+    toplevel.protocol("WM_DELETE_WINDOW", on_close_request)
+    toplevel.bind("<Destroy>", on_toplevel_destroy, add="+")
+
+    # Write anything still waiting on the debounce
+    close_hooks.append(config_store.flush)
+
+    # Client and description suggestions from past invoices; read on the
+    # first keystroke rather than at startup
+    suggestions = SuggestionStore()
+
+    def suggest_client(text, limit):
+        return suggestions.suggest("client_name", text, limit)
+
+    def suggest_description(text, limit):
+        return suggestions.suggest("description", text, limit)
+
+    def save_suggestions():
         try:
-            with open(CONFIG_PATH, "w") as f:
-                json.dump(config, f)
-        except Exception:
-            pass
+            suggestions.save()
+        except OSError:
+            pass  # Only a cache; rebuilt from the ledger next time
+
+    close_hooks.append(save_suggestions)
 
     config_data = load_config()
+    # save_config reads fields from sections built later
+    form_state = {"built": False}
 
 
     config_frame = create_section(scroll_frame, "CONFIGURATION")
@@ -216,7 +276,7 @@ def create_billing_form(master):
         if path:
             entry_logo_path.delete(0, "end")
             entry_logo_path.insert(0, path)
-            save_config()
+            on_config_change()
     btn_logo_browse = ctk.CTkButton(logo_frame, text="Browse", command=pick_logo_file, width=80)
     btn_logo_browse.pack(side="left", padx=(10, 0))
 
@@ -272,11 +332,34 @@ def create_billing_form(master):
 
     # Save config on change
     def on_config_change(event=None):
-        save_config()
+        if form_state["built"]:
+            save_config()
 
     for widget in [entry_header, entry_footer, entry_contact, entry_receiver, entry_position, entry_logo_path, entry_contact_message]:
         widget.bind("<FocusOut>", on_config_change)
     entry_body.bind("<FocusOut>", on_config_change)
+
+    # Only insert default values if config_data has a value, otherwise leave empty for placeholder
+
+    if config_data.get("header"):
+        entry_header.insert("1.0", config_data.get("header"))
+    if config_data.get("footer"):
+        entry_footer.insert("1.0", config_data.get("footer"))
+    if config_data.get("body_message"):
+        entry_body.insert("1.0", config_data.get("body_message"))
+    if config_data.get("company_contact"):
+        entry_contact.insert("1.0", config_data.get("company_contact"))
+    if config_data.get("contact_message"):
+        entry_contact_message.insert("1.0", config_data.get("contact_message"))
+    if config_data.get("receiver"):
+        entry_receiver.insert(0, config_data.get("receiver"))
+    if config_data.get("position"):
+        entry_position.insert(0, config_data.get("position"))
+    if config_data.get("logo_path"):
+        entry_logo_path.insert(0, config_data.get("logo_path"))
+
+    # Everything above fits in the window when it opens
+    yield main_frame
     
     # Client Information Section
     client_frame = create_section(scroll_frame, "CLIENT INFORMATION")
@@ -294,6 +377,7 @@ def create_billing_form(master):
         corner_radius=8
     )
     entry_name.grid(row=0, column=0, padx=(0, 5), pady=5, sticky="ew")
+    attach_autocomplete(entry_name, suggest_client)
     create_error_label(client_frame, "client_name").pack(fill="x", padx=10, pady=(0, 5))
     
     entry_date = ctk.CTkEntry(
@@ -319,6 +403,7 @@ def create_billing_form(master):
     )
     entry_service.pack(fill="x", padx=10, pady=(0, 0))
     create_error_label(service_frame, "service").pack(fill="x", padx=10, pady=(0, 5))
+    yield
     
     # Billing Statement Section
     billing_frame = create_section(scroll_frame, "BILLING STATEMENT")
@@ -338,15 +423,56 @@ def create_billing_form(master):
     ctk.CTkLabel(header_grid, text="", width=40).grid(row=0, column=3)
     
     # Items list
+    # Rows are plain dicts in item_rows. Only ITEM_POOL_SIZE rows of widgets
+    # exist; they are rebound to whichever rows are scrolled into view, so a
+    # long time-entry invoice needs no more widgets than a short one.
     items_frame = ctk.CTkFrame(billing_frame, fg_color="transparent")
     items_frame.pack(fill="x", padx=10, pady=5)
-    
+    items_frame.columnconfigure(0, weight=1)
+    rows_frame = ctk.CTkFrame(items_frame, fg_color="transparent")
+    rows_frame.grid(row=0, column=0, sticky="ew")
+    rows_frame.columnconfigure(0, weight=1)
+
     # Store item rows as a list of dicts
     item_rows = []
+    # Each row's qty * amount in centavos, keyed by the row's id
+    running_total = RunningTotal()
+    row_ids = count()
+    # Pooled row widgets and the index of the first row they show
+    pool = []
+    view = {"offset": 0}
 
-    def add_item_row(description="", qty="1", amount=""):
-        item_frame = ctk.CTkFrame(items_frame, fg_color="transparent")
-        item_frame.pack(fill="x", pady=2)
+    # Registered once and shared by every pooled entry
+    qty_vcmd = (master.register(lambda text: validate_quantity(text) or text == ""), "%P")
+    amount_vcmd = (master.register(lambda text: validate_currency(text) or text == ""), "%P")
+
+    def sync_visible_rows():
+        # Copies what is in the pooled entries back into their rows; catches
+        # edits that did not come from a key press, like pastes
+        changed = False
+        for widgets in pool:
+            row = widgets["row"]
+            if row is None:
+                continue
+            description = widgets["desc_entry"].get()
+            qty = widgets["qty_entry"].get()
+            amount = widgets["amount_entry"].get()
+            if (description, qty, amount) != (row["description"], row["qty"], row["amount"]):
+                row.update(description=description, qty=qty, amount=amount)
+                running_total.set(row["id"], line_centavos(qty, amount) or 0)
+                changed = True
+        if changed:
+            update_totals()
+
+    def on_items_wheel(event):
+        if len(item_rows) <= ITEM_POOL_SIZE:
+            return None  # Let the page scroll instead
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        scroll_items_to(view["offset"] + (-ITEM_WHEEL_ROWS if up else ITEM_WHEEL_ROWS))
+        return "break"
+
+    def create_pool_row(slot):
+        item_frame = ctk.CTkFrame(rows_frame, fg_color="transparent")
         item_frame.columnconfigure(0, weight=3)
         item_frame.columnconfigure(1, weight=1)
         item_frame.columnconfigure(2, weight=1)
@@ -360,7 +486,7 @@ def create_billing_form(master):
             corner_radius=6
         )
         entry_desc.grid(row=0, column=0, padx=(0, 5), sticky="ew")
-        entry_desc.insert(0, description)
+        attach_autocomplete(entry_desc, suggest_description)
 
         entry_qty = ctk.CTkEntry(
             item_frame, 
@@ -370,10 +496,9 @@ def create_billing_form(master):
             corner_radius=6,
             width=60,
             validate="key",
-            validatecommand=(master.register(lambda text: validate_quantity(text) or text == ""), "%P")
+            validatecommand=qty_vcmd
         )
         entry_qty.grid(row=0, column=1, padx=5, sticky="e")
-        entry_qty.insert(0, qty)
 
         entry_amount = ctk.CTkEntry(
             item_frame, 
@@ -383,19 +508,9 @@ def create_billing_form(master):
             corner_radius=6,
             width=100,
             validate="key",
-            validatecommand=(master.register(lambda text: validate_currency(text) or text == ""), "%P")
+            validatecommand=amount_vcmd
         )
         entry_amount.grid(row=0, column=2, padx=(5, 0), sticky="e")
-        entry_amount.insert(0, amount)
-
-        def remove_item():
-            item_frame.destroy()
-            # Remove from item_rows
-            for i, row in enumerate(item_rows):
-                if row['frame'] == item_frame:
-                    item_rows.pop(i)
-                    break
-            update_totals()
 
         remove_btn = ctk.CTkButton(
             item_frame,
@@ -407,7 +522,7 @@ def create_billing_form(master):
             text_color="#FF5555",
             hover_color="#330000",
             font=("Segoe UI", 14, "bold"),
-            command=remove_item
+            command=lambda: remove_item(slot)
         )
         remove_btn.grid(row=0, column=3, padx=(5, 0))
 
@@ -420,29 +535,122 @@ def create_billing_form(master):
         )
         row_error.grid(row=1, column=0, columnspan=4, sticky="w", pady=(0, 2))
 
+        widgets = {
+            'frame': item_frame,
+            'desc_entry': entry_desc,
+            'qty_entry': entry_qty,
+            'amount_entry': entry_amount,
+            'error_label': row_error,
+            'row': None,
+            'error': ""
+        }
+
         def calculate_total(*args):
-            update_totals()
+            row = widgets["row"]
+            if row is not None:
+                row["qty"] = entry_qty.get()
+                row["amount"] = entry_amount.get()
+                update_row_total(row)
+
+        def store_description(*args):
+            if widgets["row"] is not None:
+                widgets["row"]["description"] = entry_desc.get()
 
         entry_qty.bind("<KeyRelease>", calculate_total)
         entry_amount.bind("<KeyRelease>", calculate_total)
+        entry_desc.bind("<KeyRelease>", store_description)
+        for widget in (item_frame, entry_desc, entry_qty, entry_amount, row_error):
+            for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                widget.bind(sequence, on_items_wheel)
+        return widgets
+
+    def bind_pool_row(widgets, row):
+        widgets["row"] = row
+        for key, field in (("desc_entry", "description"), ("qty_entry", "qty"), ("amount_entry", "amount")):
+            entry = widgets[key]
+            entry.delete(0, "end")
+            if row[field]:
+                entry.insert(0, row[field])
+
+    def refresh_items():
+        sync_visible_rows()
+        total = len(item_rows)
+        offset = max(0, min(view["offset"], total - ITEM_POOL_SIZE))
+        view["offset"] = offset
+        visible = item_rows[offset:offset + ITEM_POOL_SIZE]
+        # The pool only grows as far as the rows need it
+        while len(pool) < len(visible):
+            pool.append(create_pool_row(len(pool)))
+        for slot, widgets in enumerate(pool):
+            if slot < len(visible):
+                row = visible[slot]
+                if widgets["row"] is not row:
+                    bind_pool_row(widgets, row)
+                if widgets["error"] != row["error"]:
+                    widgets["error_label"].configure(text=row["error"])
+                    widgets["error"] = row["error"]
+                widgets["frame"].grid(row=slot, column=0, sticky="ew", pady=2)
+            elif widgets["row"] is not None:
+                widgets["row"] = None
+                widgets["frame"].grid_remove()
+        if total > ITEM_POOL_SIZE:
+            items_scrollbar.grid(row=0, column=1, sticky="ns", padx=(5, 0))
+            items_scrollbar.set(offset / total, (offset + len(visible)) / total)
+            items_position.configure(text=f"Items {offset + 1}-{offset + len(visible)} of {total}")
+            items_position.grid(row=1, column=0, sticky="e")
+        else:
+            items_scrollbar.grid_remove()
+            items_position.grid_remove()
+
+    def scroll_items_to(offset):
+        view["offset"] = int(offset)
+        refresh_items()
+
+    def on_items_scroll(action, *args):
+        if action == "moveto":
+            scroll_items_to(float(args[0]) * len(item_rows))
+        elif action == "scroll":
+            step = ITEM_POOL_SIZE - 1 if args[1] == "pages" else 1
+            scroll_items_to(view["offset"] + int(float(args[0])) * step)
+
+    items_scrollbar = ctk.CTkScrollbar(items_frame, orientation="vertical", command=on_items_scroll)
+    items_position = ctk.CTkLabel(items_frame, text="", font=("Segoe UI", 9))
+
+    def add_item_row(description="", qty="1", amount=""):
+        row = {
+            "id": next(row_ids),
+            "description": description,
+            "qty": qty,
+            "amount": amount,
+            "error": ""
+        }
+        item_rows.append(row)
+        running_total.set(row["id"], line_centavos(qty, amount) or 0)
+        # Bring the new row into view
+        view["offset"] = len(item_rows) - ITEM_POOL_SIZE
+        refresh_items()
+        return row
+
+    def remove_item(slot):
+        row = pool[slot]["row"]
+        if row is None:
+            return
+        sync_visible_rows()
+        del item_rows[view["offset"] + slot]
+        running_total.remove(row["id"])
+        refresh_items()
+        update_totals()
 
-        # Store references in item_rows
-        item_rows.append({
-            'frame': item_frame,
-            'desc_entry': entry_desc,
-            'qty_entry': entry_qty,
-            'amount_entry': entry_amount,
-            'error_label': row_error
-        })
-        return item_frame
-    
     # Add initial item row
     add_item_row()
     
     # Add item button
     def on_add_item():
-        add_item_row()
+        row = add_item_row()
         update_totals()
+        for widgets in pool:
+            if widgets["row"] is row:
+                widgets["desc_entry"].focus_set()
     
     add_item_btn = ctk.CTkButton(
         billing_frame,
@@ -481,19 +689,16 @@ def create_billing_form(master):
     
     # Function to update totals
     def update_totals():
-        subtotal = 0.0
-        for row in item_rows:
-            qty_entry = row['qty_entry']
-            amount_entry = row['amount_entry']
-            try:
-                qty = float(qty_entry.get() or 0)
-                amount = float(amount_entry.get() or 0)
-                subtotal += qty * amount
-            except ValueError:
-                pass
-        subtotal_value.configure(text=f"PHP {subtotal:,.2f}")
+        subtotal_value.configure(text=format_php(running_total.total))
+
+    # Only the edited row is re-parsed; the total is adjusted by its change
+    def update_row_total(row):
+        running_total.set(row["id"], line_centavos(row["qty"], row["amount"]) or 0)
+        update_totals()
     
 
+    yield
+
     # Payment Information Section
     payment_frame = create_section(scroll_frame, "PAYMENT INFORMATION")
 
@@ -522,6 +727,188 @@ def create_billing_form(master):
     create_error_label(attorney_frame, "attorney").pack(fill="x", padx=10, pady=(0, 5))
     
     # PDF Generation Functions
+    def snapshot_form_data():
+        # Frozen Invoice with everything the PDF needs, taken on the Tk thread
+        # so the background render never touches a widget. Raises ValueError
+        # for amounts that cannot be parsed.
+        sync_visible_rows()
+        items = []
+        for row in item_rows:
+            desc = row['description']
+            qty = row['qty']
+            amount = row['amount']
+            if desc:
+                items.append({
+                    "description": desc,
+                    "qty": qty,
+                    "amount": amount
+                })
+        return Invoice.from_dict({
+            "receiver": entry_receiver.get(),
+            "position": entry_position.get(),
+            "client_name": entry_name.get(),
+            "date": entry_date.get(),
+            "service": entry_service.get(),
+            "status": status_var.get(),
+            "attorney": entry_attorney.get(),
+            "items": items,
+            "header": entry_header.get("1.0", "end").strip(),
+            "footer": entry_footer.get("1.0", "end").strip(),
+            "body_message": entry_body.get("1.0", "end").strip(),
+            "company_contact": entry_contact.get("1.0", "end").strip(),
+            "contact_message": entry_contact_message.get("1.0", "end").strip(),
+            "logo_path": entry_logo_path.get()
+        })
+
+    def content_hash(invoice):
+        # Identifies what a render would produce; the logo's mtime stands in
+        # for its bytes
+        payload = invoice.to_dict()
+        logo_path = invoice.logo_path
+        if logo_path and os.path.exists(logo_path):
+            payload["logo_mtime"] = os.path.getmtime(logo_path)
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    # --- Background rendering ---
+    # At most one render runs at a time; newer requests wait in order in the
+    # pending list. Every save is kept, while previews replace each other so
+    # only the latest is rendered, and a running preview is cancelled when a
+    # newer request arrives.
+    render_state = {"current": None, "pending": []}
+    render_results = queue.Queue()
+    # Bytes and temp file of the last successful render, by content hash
+    last_render = {"hash": None, "bytes": None, "preview_path": None}
+    preview_files = []
+    # Opened on first save; only used from the Tk thread
+    ledger = {"db": None}
+    # Rendered PDFs by content, shared across sessions; only used by the
+    # single render thread
+    render_cache = {"store": None}
+
+    def record_in_ledger(invoice, path):
+        # Returns the invoice number, or None if the ledger could not be written
+        try:
+            if ledger["db"] is None:
+                from app.ledger import Ledger
+                ledger["db"] = Ledger()
+            return ledger["db"].record(invoice, path)
+        except Exception as e:
+            messagebox.showwarning("Ledger Error", f"The PDF was saved but could not be recorded in the ledger: {str(e)}")
+            return None
+
+    def render_worker(job):
+        try:
+            pdf_bytes = job.get("bytes")
+            if pdf_bytes is None:
+                # reportlab is loaded on first use (usually already warmed)
+                if render_cache["store"] is None:
+                    from app.render_cache import RenderCache
+                    render_cache["store"] = RenderCache()
+                pdf_bytes = render_cache["store"].render(job["data"], cancel=job["cancel"].is_set)
+                job["bytes"] = pdf_bytes
+            if job["kind"] == "preview":
+                fd, job["path"] = tempfile.mkstemp(suffix=".pdf", prefix="gba_preview_")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(pdf_bytes)
+            else:
+                part_path = job["path"] + ".part"
+                with open(part_path, "wb") as f:
+                    f.write(pdf_bytes)
+                os.replace(part_path, job["path"])
+            render_results.put((job, None))
+        except Exception as e:
+            render_results.put((job, e))
+
+    def start_render(job):
+        current = render_state["current"]
+        if current is None:
+            render_state["current"] = job
+            threading.Thread(target=render_worker, args=(job,), daemon=True).start()
+            progress_frame.pack(fill="x", padx=15, pady=(0, 15))
+            progress_bar.start()
+            master.after(50, poll_render)
+            return
+        pending = render_state["pending"]
+        if job["kind"] == "preview":
+            pending[:] = [queued for queued in pending if queued["kind"] != "preview"]
+        pending.append(job)
+        if current["kind"] == "preview":
+            current["cancel"].set()
+
+    def poll_render():
+        try:
+            job, error = render_results.get_nowait()
+        except queue.Empty:
+            master.after(50, poll_render)
+            return
+        render_state["current"] = None
+        pending = render_state["pending"]
+        if pending:
+            start_render(pending.pop(0))
+        else:
+            progress_bar.stop()
+            progress_frame.pack_forget()
+        finish_render(job, error)
+
+    def remove_preview_files(keep=None):
+        for path in list(preview_files):
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                preview_files.remove(path)
+            except FileNotFoundError:
+                preview_files.remove(path)
+            except OSError:
+                pass  # Still open in a viewer; retried on the next cleanup
+
+    def finish_render(job, error):
+        if job["kind"] == "preview" and job.get("path"):
+            preview_files.append(job["path"])
+        # Cancelled renders end in RenderCancelled; a preview superseded after
+        # it finished is dropped as well
+        if job["cancel"].is_set() and (error is not None or job["kind"] == "preview"):
+            remove_preview_files(keep=last_render["preview_path"])
+            return
+        if error is not None:
+            messagebox.showerror("PDF Error", f"Failed to generate PDF: {str(error)}")
+            return
+        if job["hash"] != last_render["hash"]:
+            last_render.update(hash=job["hash"], bytes=job["bytes"], preview_path=None)
+        if job["kind"] == "preview":
+            last_render["preview_path"] = job["path"]
+            remove_preview_files(keep=job["path"])
+            # Open PDF in default viewer
+            import webbrowser
+            webbrowser.open(job["path"])
+        else:
+            number = record_in_ledger(job["data"], job["path"])
+            if number and suggestions.loaded:
+                suggestions.sync()
+            if number:
+                messagebox.showinfo("Success", f"Invoice {number} saved to:\n{job['path']}")
+            else:
+                messagebox.showinfo("Success", f"Invoice saved to:\n{job['path']}")
+
+    def cancel_render():
+        render_state["pending"].clear()
+        if render_state["current"] is not None:
+            render_state["current"]["cancel"].set()
+
+    def new_render_job(kind, path=None):
+        invoice = snapshot_form_data()
+        job = {
+            "kind": kind,
+            "data": invoice,
+            "hash": content_hash(invoice),
+            "path": path,
+            "cancel": threading.Event()
+        }
+        # Unchanged content is written from the bytes already rendered
+        if job["hash"] == last_render["hash"]:
+            job["bytes"] = last_render["bytes"]
+        return job
+
     def generate_pdf(filepath=None):
         if not validate_form():
             messagebox.showerror("Validation Error", "Please fix all errors before generating PDF")
@@ -534,65 +921,49 @@ def create_billing_form(master):
             )
             if not filepath:
                 return None
+        save_config()  # Save config on PDF generation as well
         try:
-            # Gather data for PDF
-            data = {
-                "receiver": entry_receiver.get(),
-                "position": entry_position.get(),
-                "client_name": entry_name.get(),
-                "date": entry_date.get(),
-                "service": entry_service.get(),
-                "status": status_var.get(),
-                "attorney": entry_attorney.get(),
-                "subtotal": subtotal_value.cget("text"),
-                "items": [],
-                "header": entry_header.get("1.0", "end").strip(),
-                "footer": entry_footer.get("1.0", "end").strip(),
-                "body_message": entry_body.get("1.0", "end").strip(),
-                "company_contact": entry_contact.get("1.0", "end").strip(),
-                "contact_message": entry_contact_message.get("1.0", "end").strip(),
-                "logo_path": entry_logo_path.get()
-            }
-            save_config()  # Save config on PDF generation as well
-            data["items"] = []
-            for row in item_rows:
-                desc = row['desc_entry'].get()
-                qty = row['qty_entry'].get()
-                amount = row['amount_entry'].get()
-                if desc:
-                    data["items"].append({
-                        "description": desc,
-                        "qty": qty,
-                        "amount": amount
-                    })
-            generate_invoice_pdf(data, filepath)
-            return filepath
-        except Exception as e:
+            job = new_render_job("save", filepath)
+        except ValueError as e:
             messagebox.showerror("PDF Error", f"Failed to generate PDF: {str(e)}")
             return None
+        start_render(job)
+        return filepath
     
     def preview_pdf():
         if not validate_form():
             messagebox.showerror("Validation Error", "Please fix all errors before previewing")
             return
-        
-        # Create temporary PDF
-        temp_pdf = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
-        temp_pdf.close()
-        pdf_path = generate_pdf(temp_pdf.name)
-        
-        if pdf_path:
-            # Open PDF in default viewer
-            webbrowser.open(pdf_path)
+        save_config()
+        try:
+            job = new_render_job("preview")
+        except ValueError as e:
+            messagebox.showerror("PDF Error", f"Failed to generate PDF: {str(e)}")
+            return
+        preview_path = last_render["preview_path"]
+        if job["hash"] == last_render["hash"] and preview_path and os.path.exists(preview_path):
+            # Nothing changed since the last preview; reopen it
+            import webbrowser
+            webbrowser.open(preview_path)
+            return
+        start_render(job)
+
+    def close_ledger():
+        if ledger["db"] is not None:
+            ledger["db"].close()
+            ledger["db"] = None
+
+    close_hooks.append(remove_preview_files)
+    close_hooks.append(close_ledger)
+    # Files still open in a viewer at close are retried on exit
+    atexit.register(remove_preview_files)
     
     # Action Buttons
     button_frame = ctk.CTkFrame(scroll_frame, fg_color="transparent")
     button_frame.pack(fill="x", padx=15, pady=(10, 15))
     
     def on_generate():
-        pdf_path = generate_pdf()
-        if pdf_path:
-            messagebox.showinfo("Success", f"Invoice saved to:\n{pdf_path}")
+        generate_pdf()
     
     btn_preview = ctk.CTkButton(
         button_frame,
@@ -615,26 +986,58 @@ def create_billing_form(master):
         font=("Segoe UI Semibold", 12)
     )
     btn_generate.pack(side="right", fill="x", expand=True)
-    
-    # Only insert default values if config_data has a value, otherwise leave empty for placeholder
 
-    if config_data.get("header"):
-        entry_header.insert("1.0", config_data.get("header"))
-    if config_data.get("footer"):
-        entry_footer.insert("1.0", config_data.get("footer"))
-    if config_data.get("body_message"):
-        entry_body.insert("1.0", config_data.get("body_message"))
-    if config_data.get("company_contact"):
-        entry_contact.insert("1.0", config_data.get("company_contact"))
-    if config_data.get("contact_message"):
-        entry_contact_message.insert("1.0", config_data.get("contact_message"))
-    if config_data.get("receiver"):
-        entry_receiver.insert(0, config_data.get("receiver"))
-    if config_data.get("position"):
-        entry_position.insert(0, config_data.get("position"))
+    # Progress indicator, shown only while a render is running
+    progress_frame = ctk.CTkFrame(scroll_frame, fg_color="transparent")
+    progress_bar = ctk.CTkProgressBar(progress_frame, mode="indeterminate")
+    progress_bar.pack(side="left", fill="x", expand=True, padx=(0, 10))
+    btn_cancel = ctk.CTkButton(
+        progress_frame,
+        text="Cancel",
+        command=cancel_render,
+        width=80,
+        height=28,
+        corner_radius=6,
+        font=("Segoe UI", 10),
+        fg_color="transparent",
+        border_width=1
+    )
+    btn_cancel.pack(side="right")
+    
     if config_data.get("attorney"):
         entry_attorney.insert(0, config_data.get("attorney"))
-    if config_data.get("logo_path"):
-        entry_logo_path.insert(0, config_data.get("logo_path"))
+    form_state["built"] = True
+
+
+def warm_renderer():
+    # Imports reportlab and renders an empty invoice so fonts and styles are
+    # loaded before the first real preview or save
+    from app.ui.pdf_generator import render_invoice_bytes
+    render_invoice_bytes(Invoice())
+
+
+def create_billing_form(master):
+    steps = _build_billing_form(master)
+    main_frame = next(steps)
+    startup.mark("visible sections built")
+
+    def warm():
+        try:
+            warm_renderer()
+            startup.mark("renderer warmed")
+        except Exception:
+            pass  # The first render loads it instead
+        startup.report()
+
+    def build_next():
+        # One step per event-loop turn so the window stays responsive
+        try:
+            next(steps)
+        except StopIteration:
+            startup.mark("form complete")
+            threading.Thread(target=warm, daemon=True).start()
+            return
+        master.after(1, build_next)
 
-    return main_frame
\ No newline at end of file
+    master.after(1, build_next)
+    return main_frame
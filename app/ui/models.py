@@ -0,0 +1,140 @@
+from collections.abc import Sequence
+from dataclasses import dataclass, fields
+import datetime
+from decimal import Decimal, DecimalException
+
+from app.ui.money import to_centavos
+from app.ui.validators import parse_date
+
+# Invoices are validated and normalised once when they are built, so the PDF
+# generator, the form and batch input all work from parsed numbers and dates.
+
+
+def _decimal(value, field):
+    try:
+        number = Decimal(str(value).strip() or 0)
+    except DecimalException:
+        raise ValueError(f"Invalid {field}: {value!r}") from None
+    if not number.is_finite():
+        raise ValueError(f"Invalid {field}: {value!r}")
+    return number
+
+
+@dataclass(frozen=True, slots=True)
+class LineItem:
+    description: str
+    qty: Decimal
+    unit_centavos: int
+    total_centavos: int
+
+    @classmethod
+    def from_dict(cls, item):
+        if isinstance(item, LineItem):
+            return item
+        qty = _decimal(item.get("qty") or 0, "quantity")
+        unit = _decimal(item.get("amount") or 0, "amount")
+        try:
+            unit_centavos = to_centavos(unit)
+            total_centavos = to_centavos(qty * unit)
+        except (ValueError, DecimalException):
+            # Finite, but too many digits for the decimal context
+            raise ValueError(f"Invalid amount/quantity: {item.get('qty')!r} x {item.get('amount')!r}") from None
+        return cls(
+            description=str(item.get("description") or ""),
+            qty=qty,
+            unit_centavos=unit_centavos,
+            total_centavos=total_centavos,
+        )
+
+    @property
+    def qty_display(self):
+        return format(self.qty.normalize(), "f")
+
+    def to_dict(self):
+        return {
+            "description": self.description,
+            "qty": self.qty_display,
+            "amount": str(Decimal(self.unit_centavos) / 100),
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class Invoice:
+    client_name: str = ""
+    date: datetime.date | None = None
+    # As entered; shown as-is when it is not a recognised date
+    date_text: str = ""
+    service: str = ""
+    status: str = "pending"
+    # A tuple of LineItem, or a lazy iterator of them for streamed statements
+    items: tuple = ()
+    # None when items is a lazy iterator; summed while drawing instead
+    subtotal_centavos: int | None = 0
+    header: str = ""
+    footer: str = ""
+    body_message: str = ""
+    company_contact: str = ""
+    contact_message: str = ""
+    receiver: str = ""
+    position: str = ""
+    attorney: str = ""
+    logo_path: str = ""
+    footer_min_font_size: float | None = None
+
+    @classmethod
+    def from_dict(cls, data):
+        raw_items = data.get("items") or ()
+        if isinstance(raw_items, (str, bytes)):
+            raise ValueError("items must be a list of line items")
+        if isinstance(raw_items, Sequence):
+            items = tuple(LineItem.from_dict(item) for item in raw_items)
+            subtotal = sum(item.total_centavos for item in items)
+        else:
+            items = map(LineItem.from_dict, raw_items)
+            subtotal = None
+        date_text = str(data.get("date") or "")
+        footer_min = data.get("footer_min_font_size")
+        if footer_min:
+            try:
+                footer_min = float(footer_min)
+            except (TypeError, ValueError):
+                footer_min = None
+            # The renderer caps it at the footer's full size
+            if footer_min is None or not 0 < footer_min < float("inf"):
+                raise ValueError(f"Invalid footer_min_font_size: {data.get('footer_min_font_size')!r}")
+        return cls(
+            client_name=str(data.get("client_name") or ""),
+            date=parse_date(date_text) if date_text else None,
+            date_text=date_text,
+            service=str(data.get("service") or ""),
+            status=str(data.get("status") or "pending"),
+            items=items,
+            subtotal_centavos=subtotal,
+            header=str(data.get("header") or ""),
+            footer=str(data.get("footer") or ""),
+            body_message=str(data.get("body_message") or ""),
+            company_contact=str(data.get("company_contact") or ""),
+            contact_message=str(data.get("contact_message") or ""),
+            receiver=str(data.get("receiver") or ""),
+            position=str(data.get("position") or ""),
+            attorney=str(data.get("attorney") or ""),
+            logo_path=str(data.get("logo_path") or ""),
+            footer_min_font_size=footer_min or None,
+        )
+
+    @property
+    def formatted_date(self):
+        # 'Month Day, Year' (e.g., July 10, 2025)
+        return self.date.strftime('%B %d, %Y') if self.date else self.date_text
+
+    def to_dict(self):
+        # Plain, JSON-serialisable form in the shape from_dict accepts
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        data["date"] = self.date_text
+        del data["date_text"]
+        data["items"] = [item.to_dict() for item in self.items]
+        return data
+
+
+def as_invoice(data):
+    return data if isinstance(data, Invoice) else Invoice.from_dict(data)
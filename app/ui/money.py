@@ -0,0 +1,57 @@
+from decimal import Decimal, DecimalException, ROUND_HALF_UP
+
+# Amounts are kept as integer centavos so totals never drift the way
+# repeated float additions do.
+
+
+def to_centavos(value):
+    # Parses a peso amount ("1234.5", 1234.5, Decimal) into integer centavos;
+    # raises ValueError when it does not parse or has too many digits
+    try:
+        amount = Decimal(str(value).strip() or 0)
+        if amount.is_finite():
+            return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except DecimalException:
+        pass
+    raise ValueError(f"Invalid amount: {value!r}")
+
+
+def line_centavos(qty_text, amount_text):
+    # qty * unit amount in centavos, or None when either field does not parse
+    try:
+        qty = Decimal(str(qty_text).strip() or 0)
+        amount = Decimal(str(amount_text).strip() or 0)
+        if not (qty.is_finite() and amount.is_finite()):
+            return None
+        # Too many digits for the decimal context also counts as not parsing
+        return int((qty * amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except DecimalException:
+        return None
+
+
+def format_php(centavos, decimals=True):
+    sign = "-" if centavos < 0 else ""
+    pesos, cents = divmod(abs(centavos), 100)
+    if decimals:
+        return f"PHP {sign}{pesos:,}.{cents:02d}"
+    # Whole pesos, truncated toward zero
+    return f"PHP {sign}{pesos:,}"
+
+
+class RunningTotal:
+    # Keeps each row's contribution so a change to one row only applies the
+    # difference instead of re-summing every row
+
+    def __init__(self):
+        self.total = 0
+        self._rows = {}
+
+    def set(self, key, centavos):
+        self.total += centavos - self._rows.get(key, 0)
+        self._rows[key] = centavos
+
+    def remove(self, key):
+        self.total -= self._rows.pop(key, 0)
+
+    def __len__(self):
+        return len(self._rows)
@@ -6,127 +6,558 @@ from reportlab.lib import colors
 from reportlab.lib.units import inch
 import tempfile
 import os
-from reportlab.lib.enums import TA_LEFT
+import hashlib
+import io
+from functools import lru_cache
+from itertools import islice
+from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
+from app.ui.models import as_invoice
+from app.ui.money import format_php
+from app.ui.render_stats import NO_STATS
 
-# Add your PDF generation functions here. Example:
-def generate_invoice_pdf(data, filename):
-    c = canvas.Canvas(filename, pagesize=A4)
-    width, height = A4
-    margin_x = 0.75 * inch  # Slightly smaller margin for A4
-    y = height - 0.75 * inch  # Top margin (for header)
+LOGO_MAX_WIDTH = 1.2 * inch  # Slightly smaller for A4
+LOGO_MAX_HEIGHT = 0.8 * inch
+# Resolution the logo is stored at once downscaled to its box on the page
+LOGO_DPI = 300
 
-    # Logo (top right, persistent)
-    logo_path = data.get("logo_path")
-    logo_max_width = 1.2 * inch  # Slightly smaller for A4
-    logo_max_height = 0.8 * inch
-    logo_margin_top = 0.2 * inch
-    logo_margin_right = 0.7 * inch
-    if logo_path:
-        if os.path.exists(logo_path):
-            try:
-                from reportlab.lib.utils import ImageReader
-                logo = ImageReader(logo_path)
-                img_width, img_height = logo.getSize()
-                aspect = img_width / img_height
-                # Fit logo inside the bounding box (never exceed either dimension)
-                scale = min(logo_max_width / img_width, logo_max_height / img_height)
-                draw_width = img_width * scale
-                draw_height = img_height * scale
-                # Center vertically in the allowed box
-                y_logo = height - logo_margin_top - ((logo_max_height - draw_height) / 2) - draw_height
-                c.drawImage(
-                    logo,
-                    width - logo_margin_right - draw_width,
-                    y_logo,
-                    width=draw_width,
-                    height=draw_height,
-                    mask='auto',
-                    preserveAspectRatio=True
-                )
-            except Exception as e:
-                c.setFont("Helvetica", 8)
-                c.setFillColorRGB(1, 0, 0)
-                c.drawString(width - logo_margin_right - logo_max_width, height - logo_margin_top - 10, f"[Logo error: {str(e)[:30]}]")
-                c.setFillColorRGB(0, 0, 0)
+# Decoded, downscaled logos keyed by (path, mtime, dpi)
+_logo_cache = {}
+
+# Paragraph styles shared by every render
+STYLES = {
+    "HeaderBold": ParagraphStyle('HeaderBold', fontName="Helvetica-Bold", fontSize=15, leading=18, alignment=0, textColor=colors.black),
+    "HeaderSub": ParagraphStyle('HeaderSub', fontName="Helvetica", fontSize=10, leading=12, alignment=0, textColor=colors.black),
+    "Body": ParagraphStyle('Body', fontName="Helvetica", fontSize=11, leading=16, textColor=colors.black, alignment=TA_JUSTIFY),
+    "desc": ParagraphStyle('desc', fontName="Helvetica", fontSize=10, leading=12, alignment=TA_LEFT),
+    "SubtotalBold": ParagraphStyle('SubtotalBold', fontName="Helvetica-Bold", fontSize=11, leading=13),
+    "ContactMsg": ParagraphStyle('ContactMsg', fontName="Helvetica", fontSize=10, leading=14, alignment=1, textColor=colors.black),
+    "Contact": ParagraphStyle('Contact', fontName="Helvetica-Bold", fontSize=11, leading=14, alignment=1, textColor=colors.black),
+}
+
+
+@lru_cache(maxsize=None)
+def footer_style(font_size, leading):
+    return ParagraphStyle('Footer', fontName="Helvetica", fontSize=font_size, leading=leading, alignment=1, textColor=colors.grey)
+
+
+@lru_cache(maxsize=256)
+def wrapped_paragraph(text, style_name, avail_width):
+    # Letterhead text comes from the saved config and rarely changes, so the
+    # parsed and wrapped Paragraph is reused across renders. Callers must not
+    # re-wrap the returned Paragraph at a different width.
+    para = Paragraph(text, STYLES[style_name])
+    w, h = para.wrap(avail_width, 0)
+    return para, w, h
+
+
+@lru_cache(maxsize=16)
+def _file_digest(path, mtime_ns, size):
+    # mtime and size are part of the memo key so an edited logo is re-read
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def logo_digest(logo_path):
+    # sha256 of the logo file's bytes, or None when it cannot be read. Names
+    # derived from it are the same wherever the file lives and however often
+    # it is touched, which keeps deterministic output reproducible.
+    try:
+        st = os.stat(logo_path)
+        return _file_digest(os.path.abspath(logo_path), st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def load_logo(logo_path, dpi=LOGO_DPI):
+    # Returns (ImageReader, draw_width, draw_height) with the image already
+    # fitted inside the logo box, decoding the file only when it changes
+    path = os.path.abspath(logo_path)
+    key = (path, os.path.getmtime(path), dpi)
+    cached = _logo_cache.get(key)
+    if cached is not None:
+        return cached
+
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+    with Image.open(path) as img:
+        img.load()
+        img_width, img_height = img.size
+        # Fit logo inside the bounding box (never exceed either dimension)
+        scale = min(LOGO_MAX_WIDTH / img_width, LOGO_MAX_HEIGHT / img_height)
+        draw_width = img_width * scale
+        draw_height = img_height * scale
+        target = (max(1, round(draw_width / 72 * dpi)), max(1, round(draw_height / 72 * dpi)))
+        # Convert first: Pillow silently resizes palette ("P") and bilevel
+        # ("1") images with NEAREST whatever filter is asked for
+        if img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGBA")
+        if target[0] < img_width:
+            img = img.resize(target, Image.LANCZOS)
         else:
+            img = img.copy()
+
+    cached = (ImageReader(img), draw_width, draw_height)
+    # Older versions of the same file are never drawn again
+    for stale in [k for k in _logo_cache if k[0] == path]:
+        del _logo_cache[stale]
+    _logo_cache[key] = cached
+    return cached
+
+
+def _logo_form(c, logo_path):
+    # The logo is embedded once per document as a form XObject and every
+    # page that shows it just references the form
+    reader, draw_width, draw_height = load_logo(logo_path)
+    name = "Logo" + logo_digest(logo_path)[:12]
+    if not c.hasForm(name):
+        c.beginForm(name, 0, 0, draw_width, draw_height)
+        c.drawImage(reader, 0, 0, width=draw_width, height=draw_height, mask='auto')
+        c.endForm()
+    return name, draw_width, draw_height
+
+
+FOOTER_MAX_FONT_SIZE = 8
+FOOTER_MIN_FONT_SIZE = 7
+# Footer sizes are tried in half-point steps
+FOOTER_SIZE_STEP = 0.5
+
+
+def _footer_paragraph(text, font_size, avail_width):
+    para = Paragraph(text, footer_style(font_size, font_size + 5))
+    w, h = para.wrap(avail_width, 0)
+    return para, w, h
+
+
+@lru_cache(maxsize=64)
+def fit_footer(text, avail_width, max_height, min_font_size=FOOTER_MIN_FONT_SIZE):
+    # Returns (Paragraph, height) for the largest footer size that fits in
+    # max_height. The common case fits at full size in a single wrap; longer
+    # footers binary-search the remaining sizes instead of re-wrapping at
+    # every step. Memoized per footer text and page geometry.
+    # A configured minimum above the full size would shrink nothing and
+    # draw the truncated footer larger than allowed
+    min_font_size = min(max(min_font_size, FOOTER_SIZE_STEP), FOOTER_MAX_FONT_SIZE)
+    footer, w, h = _footer_paragraph(text, FOOTER_MAX_FONT_SIZE, avail_width)
+    if h <= max_height:
+        return footer, h
+
+    steps = int((FOOTER_MAX_FONT_SIZE - min_font_size) / FOOTER_SIZE_STEP)
+    best = None
+    lo, hi = 0, steps - 1  # step 0 is min_font_size, step `steps` already failed
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        candidate = _footer_paragraph(text, min_font_size + mid * FOOTER_SIZE_STEP, avail_width)
+        if candidate[2] <= max_height:
+            best = candidate
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    if best is not None:
+        return best[0], best[2]
+
+    # Still too tall at the minimum size
+    if len(text) > 1500:
+        text = text[:1500] + "<br/><b>...(truncated)</b>"
+    footer, w, h = _footer_paragraph(text, min_font_size, avail_width)
+    return footer, h
+
+
+PAGE_TOP_MARGIN = 0.75 * inch
+PAGE_BOTTOM_MARGIN = 0.75 * inch
+# Line items are turned into Table objects this many rows at a time
+TABLE_CHUNK_ROWS = 100
+TABLE_HEADER = ["Description", "Qty", "Unit Price", "Amount"]
+TABLE_HEADER_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 0.5, (0.7,0.7,0.7)),
+    ('BACKGROUND', (0, 0), (-1, 0), (0.95, 0.95, 0.95)),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('TOPPADDING', (0, 0), (-1, 0), 10),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 4),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+])
+TABLE_ROWS_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('GRID', (0, 0), (-1, -1), 0.5, (0.7,0.7,0.7)),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 4),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+])
+
+
+def _new_page(c):
+    c.showPage()
+    c.setFont("Helvetica", 11)
+    return A4[1] - PAGE_TOP_MARGIN
+
+
+def _draw_flowing(c, para, x, y, avail_width):
+    # Draws a wrapped flowable at y, continuing on new pages when it does not
+    # fit above the bottom margin. Returns the y below the last part.
+    while True:
+        avail_height = y - PAGE_BOTTOM_MARGIN
+        w, h = para.wrap(avail_width, avail_height)
+        if h <= avail_height:
+            para.drawOn(c, x, y - h)
+            return y - h
+        parts = para.split(avail_width, avail_height)
+        if len(parts) != 2:
+            if y >= A4[1] - PAGE_TOP_MARGIN:
+                # Taller than a whole page and cannot be split; draw it anyway
+                para.drawOn(c, x, y - h)
+                return y - h
+            y = _new_page(c)
+            continue
+        first, para = parts
+        w, h = first.wrap(avail_width, avail_height)
+        first.drawOn(c, x, y - h)
+        y = _new_page(c)
+
+
+# --- Page templates ---
+# The letterhead, the signature block with the footer, and the body and
+# contact paragraphs only change with the config. Each is drawn once per
+# document into a form XObject named after a hash of what it shows; every
+# invoice after the first just stamps the form.
+
+LOGO_MARGIN_TOP = 0.2 * inch
+LOGO_MARGIN_RIGHT = 0.7 * inch
+
+
+def _template_name(kind, key):
+    return kind + hashlib.md5(repr(key).encode("utf-8")).hexdigest()[:12]
+
+
+@lru_cache(maxsize=32)
+def _header_layout(header, available_header_width, height):
+    # (paragraph, y) for each header line, first bold and the next two as
+    # subheader, plus the y the page content starts at below them
+    header_lines = header.split("\n")
+    first_line = header_lines[0] if len(header_lines) > 0 else ""
+    second_line = header_lines[1] if len(header_lines) > 1 else ""
+    third_line = header_lines[2] if len(header_lines) > 2 else ""
+    lines = [wrapped_paragraph(first_line, "HeaderBold", available_header_width)]
+    if second_line:
+        lines.append(wrapped_paragraph(second_line, "HeaderSub", available_header_width))
+    if third_line:
+        lines.append(wrapped_paragraph(third_line, "HeaderSub", available_header_width))
+    h_total = sum(h for _, _, h in lines)
+    header_y = height - h_total - 0.25 * inch
+    y_cursor = header_y + h_total
+    placements = []
+    for para, w, h in lines:
+        placements.append((para, y_cursor - h))
+        y_cursor -= h
+    return tuple(placements), header_y - 0.5 * inch  # Less space after header for A4
+
+
+def _draw_logo(c, logo_path, width, height):
+    if os.path.exists(logo_path):
+        try:
+            name, draw_width, draw_height = _logo_form(c, logo_path)
+            # Center vertically in the allowed box
+            y_logo = height - LOGO_MARGIN_TOP - ((LOGO_MAX_HEIGHT - draw_height) / 2) - draw_height
+            c.saveState()
+            c.translate(width - LOGO_MARGIN_RIGHT - draw_width, y_logo)
+            c.doForm(name)
+            c.restoreState()
+        except Exception as e:
             c.setFont("Helvetica", 8)
             c.setFillColorRGB(1, 0, 0)
-            c.drawString(width - logo_margin_right - logo_max_width, height - logo_margin_top - 10, "[Logo not found]")
+            c.drawString(width - LOGO_MARGIN_RIGHT - LOGO_MAX_WIDTH, height - LOGO_MARGIN_TOP - 10, f"[Logo error: {str(e)[:30]}]")
             c.setFillColorRGB(0, 0, 0)
+    else:
+        c.setFont("Helvetica", 8)
+        c.setFillColorRGB(1, 0, 0)
+        c.drawString(width - LOGO_MARGIN_RIGHT - LOGO_MAX_WIDTH, height - LOGO_MARGIN_TOP - 10, "[Logo not found]")
+        c.setFillColorRGB(0, 0, 0)
+
 
-    # Header (first line bold, next lines as subheader)
-    header_height_used = 0
-    if data.get("header"):
-        from reportlab.platypus import Paragraph
-        from reportlab.lib.styles import ParagraphStyle
-        from reportlab.lib import colors
-        max_header_height = height / 3.5  # Slightly less for A4
-        # Split header into lines
-        header_lines = data["header"].split("\n")
-        first_line = header_lines[0] if len(header_lines) > 0 else ""
-        second_line = header_lines[1] if len(header_lines) > 1 else ""
-        third_line = header_lines[2] if len(header_lines) > 2 else ""
+def _stamp_letterhead(c, invoice, width, height, margin_x, y):
+    # Logo (top right) and header (top left). Returns where the page content
+    # starts: below the header, or y when there is no header.
+    logo_path = invoice.logo_path
+    logo_key = logo_digest(logo_path) if logo_path else None
+    placements = ()
+    if invoice.header:
         # Reserve space for logo on the right
-        right_margin_for_logo = logo_max_width + logo_margin_right + 0.1 * inch
-        available_header_width = width - margin_x - right_margin_for_logo
-        # Styles
-        first_style = ParagraphStyle('HeaderBold', fontName="Helvetica-Bold", fontSize=15, leading=18, alignment=0, textColor=colors.black)
-        sub_style = ParagraphStyle('HeaderSub', fontName="Helvetica", fontSize=10, leading=12, alignment=0, textColor=colors.black)
-        # Paragraphs
-        para_first = Paragraph(first_line, first_style)
-        para_second = Paragraph(second_line, sub_style) if second_line else None
-        para_third = Paragraph(third_line, sub_style) if third_line else None
-        # Calculate heights
-        w1, h1 = para_first.wrap(available_header_width, max_header_height)
-        h_total = h1
-        w2 = w3 = 0
-        h2 = h3 = 0
-        if para_second:
-            w2, h2 = para_second.wrap(available_header_width, max_header_height - h_total)
-            h_total += h2
-        if para_third:
-            w3, h3 = para_third.wrap(available_header_width, max_header_height - h_total)
-            h_total += h3
-        # Draw header lines
-        header_y = height - h_total - 0.25 * inch
-        y_cursor = header_y + h_total
-        para_first.drawOn(c, margin_x, y_cursor - h1)
-        y_cursor -= h1
-        if para_second:
-            para_second.drawOn(c, margin_x, y_cursor - h2)
-            y_cursor -= h2
-        if para_third:
-            para_third.drawOn(c, margin_x, y_cursor - h3)
-            y_cursor -= h3
-        y = header_y - 0.5 * inch  # Less space after header for A4
-        header_height_used = h_total + 0.4 * inch
+        right_margin_for_logo = LOGO_MAX_WIDTH + LOGO_MARGIN_RIGHT + 0.1 * inch
+        placements, y = _header_layout(invoice.header, width - margin_x - right_margin_for_logo, height)
+    if not logo_path and not placements:
+        return y
+    name = _template_name("Letterhead", (logo_key, invoice.header, width, height, margin_x))
+    if not c.hasForm(name):
+        if logo_key is not None:
+            try:
+                # Forms cannot be started inside another form
+                _logo_form(c, logo_path)
+            except Exception:
+                pass  # Reported by _draw_logo
+        c.beginForm(name)
+        if logo_path:
+            _draw_logo(c, logo_path, width, height)
+        for para, para_y in placements:
+            para.drawOn(c, margin_x, para_y)
+        c.endForm()
+    c.doForm(name)
+    return y
+
+
+def _draw_block(c, blocks, x, y, avail_width):
+    # blocks: (text, style name, gap after) paragraphs stacked top-down.
+    # When the whole block fits above the bottom margin it is stamped from a
+    # form; otherwise it flows onto new pages as usual. Returns the y below.
+    paras = [(wrapped_paragraph(text, style_name, avail_width), gap) for text, style_name, gap in blocks if text]
+    if not paras:
+        return y
+    content_height = sum(h + gap for (_, _, h), gap in paras) - paras[-1][1]
+    if y - content_height < PAGE_BOTTOM_MARGIN:
+        for (para, w, h), gap in paras:
+            y = _draw_flowing(c, para, x, y, avail_width) - gap
+        return y
+    name = _template_name("Block", (blocks, avail_width))
+    if not c.hasForm(name):
+        c.beginForm(name, 0, 0, avail_width, content_height)
+        top = content_height
+        for (para, w, h), gap in paras:
+            para.drawOn(c, 0, top - h)
+            top -= h + gap
+        c.endForm()
+    c.saveState()
+    c.translate(x, y - content_height)
+    c.doForm(name)
+    c.restoreState()
+    return y - content_height - paras[-1][1]
+
+
+def _stamp_closing(c, invoice, margin_x, prepared_y, width, height):
+    # Prepared By / Noted By block and the footer at the bottom of the page
+    key = (invoice.receiver, invoice.position, invoice.attorney, invoice.footer,
+           invoice.footer_min_font_size, margin_x, prepared_y, width, height)
+    name = _template_name("Closing", key)
+    if c.hasForm(name):
+        c.doForm(name)
+        return
+    footer_obj = None
+    if invoice.footer:
+        max_footer_height = height / 3.5
+        min_font_size = invoice.footer_min_font_size or FOOTER_MIN_FONT_SIZE
+        footer_text = invoice.footer.replace("\n", "<br/>")
+        footer_obj, h = fit_footer(footer_text, width - 2 * margin_x, max_footer_height, min_font_size)
+
+    c.beginForm(name)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(margin_x, prepared_y, "Prepared By:")
+    c.setFont("Helvetica", 11)
+    receiver = invoice.receiver
+    pos_y = prepared_y - 0.22 * inch
+    if receiver:
+        c.drawString(margin_x, pos_y, receiver)
+        pos_y -= 0.22 * inch
+    position = invoice.position
+    if position:
+        c.drawString(margin_x, pos_y, position)
+        pos_y -= 0.22 * inch
+
+    # Noted By (left-aligned, not bold, below Prepared By)
+    if invoice.attorney:
+        pos_y -= 0.19 * inch
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(margin_x, pos_y, "Noted By:")
+        pos_y -= 0.27 * inch
+        c.setFont("Helvetica", 11)
+        c.drawString(margin_x, pos_y, invoice.attorney)
+
+    # Footer at the very bottom
+    if footer_obj:
+        footer_y = 0.15 * inch
+        footer_obj.drawOn(c, margin_x, footer_y)
+    c.endForm()
+    c.doForm(name)
+
+
+def _item_rows(items, totals):
+    # Turns LineItems into table rows lazily, accumulating the subtotal in
+    # totals[0] as they are consumed
+    desc_style = STYLES["desc"]
+    for item in items:
+        totals[0] += item.total_centavos
+        desc = item.description
+        # Wrap long description text
+        if len(desc) > 40:
+            desc = Paragraph(desc, desc_style)
+        yield [
+            desc,
+            item.qty_display,
+            format_php(item.unit_centavos, decimals=False),
+            format_php(item.total_centavos, decimals=False)
+        ]
+
+
+class RenderCancelled(Exception):
+    pass
+
+
+def _draw_item_table(c, items, subtotal_centavos, x, y, col_widths, cancel=None):
+    # Draws the billing table at y and returns the y below it. Items are
+    # consumed TABLE_CHUNK_ROWS at a time so very long statements never hold
+    # more than one chunk of Table rows; the table continues on new pages
+    # with the header row repeated and the subtotal row closes the last page.
+    avail_width = sum(col_widths)
+    totals = [0]
+    rows = _item_rows(items, totals)
+
+    header = Table([TABLE_HEADER], colWidths=col_widths)
+    header.setStyle(TABLE_HEADER_STYLE)
+    header_w, header_h = header.wrap(avail_width, 0)
+
+    def draw_header(y):
+        header.drawOn(c, x, y - header_h)
+        return y - header_h
+
+    # Keep the header together with at least one row
+    if y - header_h - 0.28 * inch < PAGE_BOTTOM_MARGIN:
+        y = _new_page(c)
+    y = page_top = draw_header(y)
+
+    chunk = list(islice(rows, TABLE_CHUNK_ROWS))
+    while True:
+        next_chunk = list(islice(rows, TABLE_CHUNK_ROWS))
+        is_last = not next_chunk
+        table_rows = chunk
+        if is_last:
+            if subtotal_centavos is None:
+                subtotal_centavos = totals[0]
+            subtotal = format_php(subtotal_centavos, decimals=False)
+            # Make 'Subtotal:' and the value bold using Paragraph
+            subtotal_bold_style = STYLES["SubtotalBold"]
+            table_rows = chunk + [["", "", Paragraph("Subtotal:", subtotal_bold_style), Paragraph(subtotal, subtotal_bold_style)]]
+        table = Table(table_rows, colWidths=col_widths)
+        table.setStyle(TABLE_ROWS_STYLE)
+
+        pending = table
+        while pending is not None:
+            avail_height = y - PAGE_BOTTOM_MARGIN
+            w, h = pending.wrap(avail_width, avail_height)
+            parts = [] if h <= avail_height else pending.split(avail_width, avail_height)
+            if h <= avail_height or (not parts and y == page_top):
+                # Fits, or a single row taller than a whole page
+                pending.drawOn(c, x, y - h)
+                y -= h
+                pending = None
+                continue
+            if len(parts) == 2:
+                w, h = parts[0].wrap(avail_width, avail_height)
+                parts[0].drawOn(c, x, y - h)
+                pending = parts[1]
+            y = page_top = draw_header(_new_page(c))
+
+        if is_last:
+            return y
+        if cancel is not None and cancel():
+            raise RenderCancelled()
+        chunk = next_chunk
+
+
+def _new_canvas(filename, deterministic=False):
+    # In deterministic mode reportlab's invariant output replaces the
+    # wall-clock timestamp and the random document ID, so the same invoice
+    # always produces the same bytes (for hashing, caching and golden files)
+    return canvas.Canvas(filename, pagesize=A4, invariant=1 if deterministic else None)
+
+
+def _set_document_date(c, invoice):
+    # Deterministic documents carry the invoice date as their creation date;
+    # undated ones keep reportlab's fixed invariant date
+    invoice_date = invoice.date
+    if invoice_date is not None:
+        stamp = f"D:{invoice_date.year:04d}{invoice_date.month:02d}{invoice_date.day:02d}000000+00'00'"
+        c.setDateFormatter(lambda *timestamp: stamp)
+
+
+# Add your PDF generation functions here. Example:
+def generate_invoice_pdf(data, filename, cancel=None, stats=None, deterministic=False):
+    # data is an Invoice or a dict in the shape Invoice.from_dict accepts.
+    # filename may also be any writable binary stream (e.g. BytesIO).
+    # cancel is an optional callable polled between table chunks; when it
+    # returns True rendering stops with RenderCancelled and nothing is saved.
+    # stats is an optional RenderStats that receives per-section timings.
+    # deterministic=True makes the output byte-identical across runs.
+    stats = stats or NO_STATS
+    stats.start()
+    invoice = as_invoice(data)
+    c = _new_canvas(filename, deterministic)
+    if deterministic:
+        _set_document_date(c, invoice)
+    draw_invoice(c, invoice, cancel=cancel, stats=stats)
+    if cancel is not None and cancel():
+        raise RenderCancelled()
+    c.save()
+    stats.lap("save")
+
+
+def render_invoice_bytes(data, cancel=None, stats=None, deterministic=False):
+    # Renders in memory and returns the PDF bytes
+    buffer = io.BytesIO()
+    generate_invoice_pdf(data, buffer, cancel=cancel, stats=stats, deterministic=deterministic)
+    return buffer.getvalue()
+
+
+def generate_invoices_pdf(invoices, filename, stats=None, deterministic=False):
+    # Renders a sequence of invoices (or invoice dicts) into one PDF, each starting on a new
+    # page. Fonts and the logo are shared by the whole document and the
+    # sequence is consumed lazily, so it may be a generator. stats, if given,
+    # accumulates section timings over every invoice. In deterministic mode
+    # the document is dated with the first invoice's date.
+    stats = stats or NO_STATS
+    c = _new_canvas(filename, deterministic)
+    count = 0
+    for data in invoices:
+        stats.start()
+        invoice = as_invoice(data)
+        if deterministic and count == 0:
+            _set_document_date(c, invoice)
+        draw_invoice(c, invoice, stats=stats)
+        c.showPage()
+        count += 1
+    stats.start()
+    c.save()
+    stats.lap("save")
+    return count
+
+
+def draw_invoice(c, data, cancel=None, stats=None):
+    # Draws one invoice onto the canvas starting at the top of the current page
+    stats = stats or NO_STATS
+    invoice = as_invoice(data)
+    stats.lap("prepare")
+    width, height = A4
+    margin_x = 0.75 * inch  # Slightly smaller margin for A4
+    y = height - 0.75 * inch  # Top margin (for header)
+
+    # Logo and header
+    y = _stamp_letterhead(c, invoice, width, height, margin_x, y)
+    stats.lap("letterhead")
     c.setFont("Helvetica", 11)
     c.setFillColorRGB(0, 0, 0)
 
 
 
     # Name, Date, Re
-    c.drawString(margin_x, y, f"Attention: {data.get('client_name', '')} ")
+    c.drawString(margin_x, y, f"Attention: {invoice.client_name} ")
     y -= 0.28 * inch
 
-    # Format date as 'Month Day, Year' (e.g., July 10, 2025)
-    import datetime
-    raw_date = data.get('date', '')
-    formatted_date = raw_date
-    try:
-        # Try MM-DD-YYYY
-        dt = datetime.datetime.strptime(raw_date, '%m-%d-%Y')
-        formatted_date = dt.strftime('%B %d, %Y')
-    except Exception:
-        try:
-            # Try YYYY-MM-DD
-            dt = datetime.datetime.strptime(raw_date, '%Y-%m-%d')
-            formatted_date = dt.strftime('%B %d, %Y')
-        except Exception:
-            pass
-    c.drawString(margin_x, y, f"Date: {formatted_date}")
+    c.drawString(margin_x, y, f"Date: {invoice.formatted_date}")
     y -= 0.28 * inch
-    c.drawString(margin_x, y, f"Re: {data.get('service', '')}")
+    c.drawString(margin_x, y, f"Re: {invoice.service}")
     y -= 0.35 * inch
 
     # Divider
@@ -134,37 +565,14 @@ def generate_invoice_pdf(data, filename):
     c.setLineWidth(0.6)
     c.line(margin_x, y, width - margin_x, y)
     y -= 0.3 * inch
+    stats.lap("details")
 
     # Body Message (dynamic height, supports overflow to new page)
-    from reportlab.platypus import Paragraph, Frame
-    from reportlab.lib.styles import ParagraphStyle
-    from reportlab.lib import colors
-    body_message = data.get("body_message", "")
-    from reportlab.lib.enums import TA_JUSTIFY
-    body_style = ParagraphStyle('Body', fontName="Helvetica", fontSize=11, leading=16, textColor=colors.black, alignment=TA_JUSTIFY)
+    body_message = invoice.body_message
     if body_message:
-        body = Paragraph(body_message.replace("\n", "<br/>"), body_style)
-        avail_height = y - 0.75 * inch  # Reserve bottom margin
-        w, h = body.wrap(width - 2 * margin_x, avail_height)
-        if h <= avail_height:
-            body.drawOn(c, margin_x, y - h)
-            y -= h + 0.15 * inch
-        else:
-            # Split and render across pages
-            story = body.split(width - 2 * margin_x, avail_height)
-            for part in story:
-                part_h = part.height
-                if part_h > avail_height:
-                    part_h = avail_height
-                part.drawOn(c, margin_x, y - part_h)
-                y -= part_h
-                c.showPage()
-                c.setFont("Helvetica", 11)
-                y = height - 0.75 * inch
-                avail_height = y - 0.75 * inch
-            y -= 0.15 * inch
-    else:
-        y -= 0.15 * inch
+        y = _draw_block(c, ((body_message.replace("\n", "<br/>"), "Body", 0),), margin_x, y, width - 2 * margin_x)
+    y -= 0.15 * inch
+    stats.lap("body")
 
 
     # --- Move BILLING STATEMENT section above contact info ---
@@ -188,33 +596,9 @@ def generate_invoice_pdf(data, filename):
     c.setStrokeColorRGB(0, 0, 0)
     c.line(title_x, underline_y, title_x + title_width, underline_y)
     y -= 0.30 * inch
+    stats.lap("title")
 
     # Table
-    table_data = [["Description", "Qty", "Unit Price", "Amount"]]
-    for item in data.get("items", []):
-        try:
-            qty_val = float(item.get("qty") or 0)
-            amount_val = float(item.get("amount") or 0)
-            total = qty_val * amount_val
-            table_data.append([
-                item.get("description", ""),
-                item.get("qty", ""),
-                f"PHP {int(amount_val):,}",
-                f"PHP {int(total):,}"
-            ])
-        except ValueError:
-            pass
-    subtotal = data.get("subtotal", "PHP 0")
-    if isinstance(subtotal, str) and "." in subtotal:
-        subtotal = subtotal.split(".")[0]
-    # Make 'Subtotal:' and the value bold using Paragraph
-    from reportlab.platypus import Paragraph
-    from reportlab.lib.styles import ParagraphStyle
-    subtotal_bold_style = ParagraphStyle('SubtotalBold', fontName="Helvetica-Bold", fontSize=11, leading=13)
-    subtotal_label_para = Paragraph("Subtotal:", subtotal_bold_style)
-    subtotal_value_para = Paragraph(str(subtotal), subtotal_bold_style)
-    table_data.append(["", "", subtotal_label_para, subtotal_value_para])
-
     # Calculate responsive column widths based on available width
     available_width = width - 2 * margin_x
     desc_col = 0.38 * available_width
@@ -222,39 +606,9 @@ def generate_invoice_pdf(data, filename):
     unit_col = 0.23 * available_width
     amt_col = 0.26 * available_width
 
-    # Wrap long description text before creating the Table
-    from reportlab.platypus import Paragraph
-    from reportlab.lib.styles import ParagraphStyle
-    from reportlab.lib.enums import TA_LEFT
-    desc_style = ParagraphStyle('desc', fontName="Helvetica", fontSize=10, leading=12, alignment=TA_LEFT)
-    for i in range(1, len(table_data)):
-        desc = table_data[i][0]
-        if isinstance(desc, str) and len(desc) > 40:
-            table_data[i][0] = Paragraph(desc, desc_style)
-    table = Table(table_data, colWidths=[desc_col, qty_col, unit_col, amt_col])
-    table_style = [
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('FONTSIZE', (0, 1), (-1, -1), 11),
-        ('GRID', (0, 0), (-1, -1), 0.5, (0.7,0.7,0.7)),
-        ('BACKGROUND', (0, 0), (-1, 0), (0.95, 0.95, 0.95)),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('TOPPADDING', (0, 0), (-1, 0), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 4),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-    ]
-    # Right-align the subtotal value (last row, last column)
-    subtotal_row_idx = len(table_data) - 1
-    table_style.append(('ALIGN', (3, subtotal_row_idx), (3, subtotal_row_idx), 'RIGHT'))
-    table.setStyle(TableStyle(table_style))
-
-    table_height = (len(table_data) + 1) * 0.28 * inch
-    table.wrapOn(c, width, height)
-    table.drawOn(c, margin_x, y - table_height)
-    y -= table_height + 0.35 * inch
+    y = _draw_item_table(c, invoice.items, invoice.subtotal_centavos, margin_x, y, [desc_col, qty_col, unit_col, amt_col], cancel=cancel)
+    y -= 0.35 * inch
+    stats.lap("table")
 
     # --- Contact Information Section (after billing statement) ---
     # Divider
@@ -263,111 +617,19 @@ def generate_invoice_pdf(data, filename):
     c.line(margin_x, y, width - margin_x, y)
     y -= 0.35 * inch
 
-    # Contact Message (black, centered)
-    contact_message = data.get("contact_message", "")
-    if contact_message:
-        contact_message_style = ParagraphStyle('ContactMsg', fontName="Helvetica", fontSize=10, leading=14, alignment=1, textColor=colors.black)
-        contact_msg = Paragraph(contact_message.replace("\n", "<br/>"), contact_message_style)
-        avail_height = y - 0.75 * inch
-        w, h = contact_msg.wrap(width - 2 * margin_x, avail_height)
-        if h <= avail_height:
-            contact_msg.drawOn(c, margin_x, y - h)
-            y -= h + 0.1 * inch
-        else:
-            # Split and render across pages
-            story = contact_msg.split(width - 2 * margin_x, avail_height)
-            for part in story:
-                part_h = part.height
-                if part_h > avail_height:
-                    part_h = avail_height
-                part.drawOn(c, margin_x, y - part_h)
-                y -= part_h
-                c.showPage()
-                c.setFont("Helvetica", 11)
-                y = height - 0.75 * inch
-                avail_height = y - 0.75 * inch
-            y -= 0.1 * inch
-
-    # Company Contact (black, centered)
-    company_contact = data.get("company_contact", "")
-    contact_style = ParagraphStyle('Contact', fontName="Helvetica-Bold", fontSize=11, leading=14, alignment=1, textColor=colors.black)
-    if company_contact:
-        contact = Paragraph(company_contact.replace("\n", "<br/>"), contact_style)
-        avail_height = y - 0.75 * inch
-        w, h = contact.wrap(width - 2 * margin_x, avail_height)
-        if h <= avail_height:
-            contact.drawOn(c, margin_x, y - h)
-            y -= h + 0.3 * inch
-        else:
-            # Split and render across pages
-            story = contact.split(width - 2 * margin_x, avail_height)
-            for part in story:
-                part_h = part.height
-                if part_h > avail_height:
-                    part_h = avail_height
-                part.drawOn(c, margin_x, y - part_h)
-                y -= part_h
-                c.showPage()
-                c.setFont("Helvetica", 11)
-                y = height - 0.75 * inch
-                avail_height = y - 0.75 * inch
-            y -= 0.3 * inch
-
-    # --- Calculate footer height, but do not draw yet ---
-    footer_height = 0
-    footer_obj = None
-    if data.get("footer"):
-        from reportlab.platypus import Paragraph
-        from reportlab.lib.styles import ParagraphStyle
-        from reportlab.lib import colors
-        max_footer_height = height / 3.5
-        min_font_size = 7
-        font_size = 8
-        leading = 13
-        footer_text = data["footer"].replace("\n", "<br/>")
-        while font_size >= min_font_size:
-            footer_style = ParagraphStyle('Footer', fontName="Helvetica", fontSize=font_size, leading=leading, alignment=1, textColor=colors.grey)
-            footer = Paragraph(footer_text, footer_style)
-            w, h = footer.wrap(width - 2 * margin_x, max_footer_height)
-            if h <= max_footer_height:
-                break
-            font_size -= 2
-            leading = max(leading - 2, font_size + 2)
-        else:
-            footer_text = footer_text[:1500] + "<br/><b>...(truncated)</b>" if len(footer_text) > 1500 else footer_text
-            footer = Paragraph(footer_text, footer_style)
-            w, h = footer.wrap(width - 2 * margin_x, max_footer_height)
-        footer_obj = footer
-        footer_height = h
+    # Contact Message, then Company Contact (black, centered)
+    y = _draw_block(c, (
+        (invoice.contact_message.replace("\n", "<br/>"), "ContactMsg", 0.1 * inch),
+        (invoice.company_contact.replace("\n", "<br/>"), "Contact", 0.3 * inch),
+    ), margin_x, y, width - 2 * margin_x)
+    stats.lap("contact")
 
-    # Place Prepared By and Noted By exactly 1 inch above the bottom
+    # Prepared By / Noted By sit at a fixed height above the footer
     prepared_y = 2.30 * inch 
-    
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(margin_x, prepared_y, "Prepared By:")
-    c.setFont("Helvetica", 11)
-    receiver = data.get("receiver", "")
-    pos_y = prepared_y - 0.22 * inch
-    if receiver:
-        c.drawString(margin_x, pos_y, receiver)
-        pos_y -= 0.22 * inch
-    position = data.get("position")
-    if position:
-        c.drawString(margin_x, pos_y, position)
-        pos_y -= 0.22 * inch
-
-    # Noted By (left-aligned, not bold, below Prepared By)
-    if data.get("attorney"):
-        pos_y -= 0.19 * inch
-        c.setFont("Helvetica-Bold", 11)
-        c.drawString(margin_x, pos_y, "Noted By:")
-        pos_y -= 0.27 * inch
-        c.setFont("Helvetica", 11)
-        c.drawString(margin_x, pos_y, data["attorney"])
+    # Start a fresh page if the table or contact blocks ran into this area
+    if y < prepared_y + 0.3 * inch:
+        _new_page(c)
 
-    # Now draw the footer at the very bottom
-    if footer_obj:
-        footer_y = 0.15 * inch
-        footer_obj.drawOn(c, margin_x, footer_y)
-
-    c.save()
+    # Prepared By / Noted By and the footer
+    _stamp_closing(c, invoice, margin_x, prepared_y, width, height)
+    stats.lap("closing")
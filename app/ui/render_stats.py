@@ -0,0 +1,96 @@
+import sys
+from time import perf_counter
+
+# Opt-in per-section instrumentation for invoice rendering.
+#
+# Rendering code calls start() once and lap(name) at the end of each section;
+# a lap charges the wall time and the change in allocated memory blocks since
+# the previous lap to that section. Renders that are not being measured get
+# NO_STATS, whose methods do nothing.
+
+
+class RenderStats:
+
+    def __init__(self):
+        # name -> [seconds, allocated block delta, count], in drawing order
+        self.sections = {}
+        self._time = None
+        self._blocks = 0
+
+    def start(self):
+        self._time = perf_counter()
+        self._blocks = sys.getallocatedblocks()
+
+    def lap(self, name):
+        now = perf_counter()
+        blocks = sys.getallocatedblocks()
+        if self._time is not None:
+            section = self.sections.setdefault(name, [0.0, 0, 0])
+            section[0] += now - self._time
+            section[1] += blocks - self._blocks
+            section[2] += 1
+        self._time = now
+        self._blocks = blocks
+
+    @property
+    def total_seconds(self):
+        return sum(section[0] for section in self.sections.values())
+
+    def as_dict(self):
+        # Plain, picklable form for sending back from worker processes
+        return {
+            name: {"seconds": seconds, "blocks": blocks, "count": count}
+            for name, (seconds, blocks, count) in self.sections.items()
+        }
+
+
+class _NoStats:
+
+    def start(self):
+        pass
+
+    def lap(self, name):
+        pass
+
+
+NO_STATS = _NoStats()
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of an already sorted list
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples, percentiles=(0.5, 0.9, 0.99)):
+    # Aggregates RenderStats.as_dict() results from many renders into
+    # per-section percentiles of wall time (seconds) and block deltas
+    by_section = {}
+    for sample in samples:
+        for name, section in sample.items():
+            times, blocks = by_section.setdefault(name, ([], []))
+            times.append(section["seconds"])
+            blocks.append(section["blocks"])
+    summary = {}
+    for name, (times, blocks) in by_section.items():
+        times.sort()
+        blocks.sort()
+        entry = {"count": len(times), "total_seconds": sum(times), "max_seconds": times[-1]}
+        for fraction in percentiles:
+            label = f"p{fraction * 100:g}"
+            entry[f"{label}_seconds"] = percentile(times, fraction)
+            entry[f"{label}_blocks"] = percentile(blocks, fraction)
+        summary[name] = entry
+    return summary
+
+
+def format_summary(summary):
+    lines = [f"{'section':<12}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'p50 blocks':>12}"]
+    for name, entry in summary.items():
+        lines.append(
+            f"{name:<12}{entry['count']:>8}"
+            f"{entry.get('p50_seconds', 0) * 1000:>10.2f}{entry.get('p90_seconds', 0) * 1000:>10.2f}"
+            f"{entry.get('p99_seconds', 0) * 1000:>10.2f}{entry['max_seconds'] * 1000:>10.2f}"
+            f"{entry.get('p50_blocks', 0):>12}"
+        )
+    return "\n".join(lines)
@@ -1,5 +1,23 @@
 import re
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from app.ui.money import to_centavos
+
+NAME_RE = re.compile(r"^[a-zA-Z\s\-\.']+$")
+# MM-DD-YYYY or YYYY-MM-DD
+DATE_RE = re.compile(r"^(?:(\d{1,2})-(\d{1,2})-(\d{4})|(\d{4})-(\d{1,2})-(\d{1,2}))$")
+# Plain decimal numbers, optionally signed or in exponent form
+NUMBER_RE = re.compile(r"^\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*$")
+
+def fits_amount(text):
+    # Whether the invoice model can hold the number: finite and within the
+    # digits of its centavo arithmetic (float alone accepts 1e400 as inf)
+    try:
+        to_centavos(text)
+        return True
+    except ValueError:
+        return False
 
 def validate_required(text):
     return len(text.strip()) > 0
@@ -8,6 +26,7 @@ def validate_currency(text):
     try:
         if text:
             float(text)
+            return fits_amount(text)
         return True
     except ValueError:
         return False
@@ -16,22 +35,132 @@ def validate_quantity(text):
     try:
         if text:
             qty = float(text)
-            return qty > 0
+            return qty > 0 and fits_amount(text)
         return True
     except ValueError:
         return False
 
+def parse_date(text):
+    # Fast path: one regex match and a date() call instead of trying two
+    # strptime formats and catching the failures
+    match = DATE_RE.match(text)
+    if match:
+        month, day, year, year2, month2, day2 = match.groups()
+        try:
+            if year:
+                return date(int(year), int(month), int(day))
+            return date(int(year2), int(month2), int(day2))
+        except ValueError:
+            return None
+    # Rarer spellings strptime still accepts
+    for fmt in ("%m-%d-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    return None
+
 def validate_date(text):
-    try:
-        if text:
-            # Accept both MM-DD-YYYY and YYYY-MM-DD
-            try:
-                datetime.strptime(text, "%m-%d-%Y")
-            except ValueError:
-                datetime.strptime(text, "%Y-%m-%d")
-        return True
-    except ValueError:
-        return False
+    # Accept both MM-DD-YYYY and YYYY-MM-DD
+    return not text or parse_date(text) is not None
 
 def validate_name(text):
-    return bool(re.match(r"^[a-zA-Z\s\-\.']+$", text)) if text else True
+    return bool(NAME_RE.match(text)) if text else True
+
+
+# --- Bulk validation for imported batches ---
+
+@dataclass
+class ValidationReport:
+    rows: int = 0
+    # (row index, field, message)
+    errors: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def bad_rows(self):
+        return sorted({row for row, _, _ in self.errors})
+
+    def errors_by_row(self):
+        by_row = {}
+        for row, field_name, message in self.errors:
+            by_row.setdefault(row, []).append((field_name, message))
+        return by_row
+
+    def counts(self):
+        counts = {}
+        for _, field_name, _ in self.errors:
+            counts[field_name] = counts.get(field_name, 0) + 1
+        return counts
+
+
+def validate_columns(client_names=None, dates=None, quantities=None, amounts=None, rows=None, start=0):
+    # Validates whole columns at once. client_names and dates have one value
+    # per row; quantities and amounts may have several values per row (one
+    # per line item), in which case `rows` gives the row index of each value.
+    # Row indexes in the report are offset by `start`.
+    report = ValidationReport()
+    errors = report.errors
+    if client_names is not None:
+        report.rows = max(report.rows, len(client_names))
+        match = NAME_RE.match
+        for i, name in enumerate(client_names):
+            if not name or not name.strip():
+                errors.append((start + i, "client_name", "Client name is required"))
+            elif not match(name):
+                errors.append((start + i, "client_name", "Invalid client name"))
+    if dates is not None:
+        report.rows = max(report.rows, len(dates))
+        for i, text in enumerate(dates):
+            if text and parse_date(text) is None:
+                errors.append((start + i, "date", "Invalid date format (MM-DD-YYYY or YYYY-MM-DD)"))
+    number = NUMBER_RE.match
+    if quantities is not None:
+        for i, text in enumerate(quantities):
+            if text and not (number(text) and float(text) > 0 and fits_amount(text)):
+                row = rows[i] if rows is not None else i
+                errors.append((start + row, "qty", f"Quantity must be positive number: {text!r}"))
+    if amounts is not None:
+        for i, text in enumerate(amounts):
+            if text and not (number(text) and fits_amount(text)):
+                row = rows[i] if rows is not None else i
+                errors.append((start + row, "amount", f"Invalid amount: {text!r}"))
+    errors.sort(key=lambda error: error[0])
+    return report
+
+
+def validate_records(records, start=0):
+    # Splits invoice dicts into columns and validates them in one pass each
+    client_names, dates, quantities, amounts, item_rows = [], [], [], [], []
+    shape_errors = []
+    # Rows that are not objects at all; their column errors are meaningless
+    not_objects = set()
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            shape_errors.append((start + i, "record", "Record must be an object"))
+            not_objects.add(start + i)
+            # Placeholders keep the columns aligned with the rows
+            client_names.append("")
+            dates.append("")
+            continue
+        client_names.append(str(record.get("client_name") or ""))
+        dates.append(str(record.get("date") or ""))
+        items = record.get("items") or ()
+        if not isinstance(items, (list, tuple)) or not all(isinstance(item, dict) for item in items):
+            shape_errors.append((start + i, "items", "Items must be a list of objects"))
+            continue
+        for item in items:
+            # A numeric 0 is a value to check, not a missing one
+            qty, amount = item.get("qty"), item.get("amount")
+            quantities.append("" if qty is None else str(qty))
+            amounts.append("" if amount is None else str(amount))
+            item_rows.append(i)
+    report = validate_columns(client_names, dates, quantities, amounts, rows=item_rows, start=start)
+    if shape_errors:
+        report.errors = [error for error in report.errors if error[0] not in not_objects]
+        report.errors.extend(shape_errors)
+        report.errors.sort(key=lambda error: error[0])
+    return report